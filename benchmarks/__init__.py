@@ -0,0 +1,2 @@
+# Headless benchmarks for the inventory hot paths. Build a database with
+# "python -m benchmarks.generate", then time it with "python -m benchmarks.run".
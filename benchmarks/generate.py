@@ -0,0 +1,150 @@
+import argparse
+import os
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from inventory_core.journal import LEVELS, NO_LIMIT
+from inventory_core.schema import backfill_sales_daily, migrate
+from inventory_core.timeutil import MICROS_PER_DAY, MICROS_PER_SECOND, from_day, to_day, to_micros
+
+# Builds a synthetic inventory database at a given scale. Item popularity is
+# long-tailed, weekends are busier than weekdays, demand drifts slowly over
+# the period and sales cluster around lunch and dinner, so reports, trends
+# and forecasts see data shaped like a real restaurant's.
+
+ADJECTIVES = ['fresh', 'frozen', 'organic', 'smoked', 'dried', 'spicy', 'sweet', 'sliced', 'whole', 'ground']
+FOODS = ['tomato', 'onion', 'garlic', 'basil', 'chicken', 'beef', 'salmon', 'rice', 'flour', 'butter',
+         'cheese', 'lettuce', 'pepper', 'potato', 'lemon', 'mushroom', 'cream', 'egg', 'bread', 'pasta']
+UNITS = ['case', 'crate', 'bag', 'box', 'tray', 'bottle', 'tin', 'pack']
+
+# Relative busyness Monday..Sunday and the lunch and dinner rushes (hour,
+# spread in hours, share of the day's sales)
+WEEKDAY_WEIGHTS = np.array([0.8, 0.85, 0.9, 1.0, 1.3, 1.5, 1.2])
+RUSHES = [(12.5, 1.0, 0.4), (19.0, 1.5, 0.6)]
+
+
+def generate_items(conn, rng, count, now):
+    adjectives = rng.choice(ADJECTIVES, count)
+    foods = rng.choice(FOODS, count)
+    units = rng.choice(UNITS, count)
+    quantities = rng.integers(0, 500, count)
+    prices = np.round(rng.uniform(0.5, 80, count), 2)
+    min_qtys = np.where(rng.random(count) < 0.3, rng.integers(5, 50, count), -1)
+    rows = ((f"{adjective} {food} {i}", f"{food} per {unit}", int(quantity), float(price), now,
+             None if min_qty < 0 else int(min_qty))
+            for i, (adjective, food, unit, quantity, price, min_qty)
+            in enumerate(zip(adjectives, foods, units, quantities, prices, min_qtys)))
+    conn.executemany("INSERT INTO items (name, description, quantity, price, time, min_qty) VALUES (?, ?, ?, ?, ?, ?)", rows)
+    return [row[0] for row in conn.execute("SELECT name FROM items ORDER BY item_id")]
+
+
+def generate_sales(conn, rng, names, count, days, end_day, chunk_size=500000, progress=None):
+    # Popularity follows a Zipf-like curve over a shuffled item order
+    popularity = 1 / np.arange(1, len(names) + 1) ** 1.1
+    popularity = popularity[rng.permutation(len(names))]
+    popularity /= popularity.sum()
+
+    # Busier weekends and a gentle upward drift over the period
+    first_day = end_day - days + 1
+    day_numbers = np.arange(first_day, end_day + 1)
+    weekdays = (day_numbers + 3) % 7
+    day_weights = WEEKDAY_WEIGHTS[weekdays] * np.linspace(0.8, 1.2, days)
+    day_weights /= day_weights.sum()
+
+    names = np.array(names, dtype=object)
+    done = 0
+    while done < count:
+        n = min(chunk_size, count - done)
+        items = rng.choice(len(names), n, p=popularity)
+        sale_days = rng.choice(day_numbers, n, p=day_weights)
+        rush = rng.choice(len(RUSHES), n, p=[share for _, _, share in RUSHES])
+        hours = np.array([hour for hour, _, _ in RUSHES])[rush] + rng.normal(0, 1, n) * np.array([spread for _, spread, _ in RUSHES])[rush]
+        seconds = np.clip(hours * 3600, 0, 86399).astype(np.int64)
+        times = sale_days * MICROS_PER_DAY + seconds * MICROS_PER_SECOND + rng.integers(0, MICROS_PER_SECOND, n)
+        times.sort()
+        quantities = rng.geometric(0.5, n)
+        conn.executemany("INSERT INTO sales (item_id, item_name, quantity_sold, time_sold) VALUES (?, ?, ?, ?)",
+                         zip((items + 1).tolist(), names[items].tolist(), quantities.tolist(), times.tolist()))
+        done += n
+        if progress is not None:
+            progress(done)
+
+
+def generate_journal(conn, first_day, end_day):
+    # The stock journal as the app would have written it: each item opens
+    # the history with what it has now plus everything sold since, every
+    # sale is a movement, and a snapshot is left at the start of each month
+    # as prune_snapshots would keep them
+    conn.execute("DELETE FROM stock_movements")
+    conn.execute(f"""INSERT INTO stock_movements (time, item_id, item_name, kind, delta)
+                     SELECT {first_day * MICROS_PER_DAY}, items.item_id, items.name, 'opening',
+                            COALESCE(items.quantity, 0) + COALESCE(sold.quantity, 0)
+                     FROM items LEFT JOIN (SELECT item_id, SUM(quantity_sold) AS quantity FROM sales GROUP BY item_id) AS sold
+                     ON sold.item_id = items.item_id ORDER BY items.item_id""")
+    openings = conn.execute("SELECT COUNT(*) FROM stock_movements").fetchone()[0]
+    conn.execute("""INSERT INTO stock_movements (time, item_id, item_name, kind, delta)
+                    SELECT time_sold, item_id, item_name, 'sale', -quantity_sold FROM sales ORDER BY time_sold, sale_id""")
+
+    # Movement ids follow time, so the last id before a month starts is the
+    # openings plus the sales before it
+    previous_id, previous_upto = None, 0
+    month = (from_day(first_day).replace(day=1) + timedelta(days=32)).replace(day=1)
+    while to_day(month) <= end_day:
+        start = to_micros(month)
+        upto = openings + conn.execute("SELECT COUNT(*) FROM sales WHERE time_sold < ?", (start,)).fetchone()[0]
+        snapshot_id = conn.execute("INSERT INTO stock_snapshots (time, last_movement_id) VALUES (?, ?)",
+                                   (start, upto)).lastrowid
+        conn.execute("INSERT INTO stock_snapshot_levels (snapshot_id, item_id, name, quantity) "
+                     "SELECT :new_id, item_id, name, quantity FROM (" + LEVELS + ")", {
+                         'new_id': snapshot_id, 'snapshot_id': previous_id, 'after_id': previous_upto,
+                         'upto_id': upto, 'before': NO_LIMIT,
+                     })
+        previous_id, previous_upto = snapshot_id, upto
+        month = (month + timedelta(days=32)).replace(day=1)
+
+
+def generate(path, items=100000, sales=10000000, days=365, seed=1, end=None, progress=None):
+    # Writes a fresh database at path; returns the seconds it took
+    start = time.perf_counter()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    rng = np.random.default_rng(seed)
+    end_day = to_day(end or date.today())
+
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA journal_mode = MEMORY")
+    conn.execute("BEGIN")
+    names = generate_items(conn, rng, items, end_day * MICROS_PER_DAY)
+    generate_sales(conn, rng, names, sales, days, end_day, progress=progress)
+    backfill_sales_daily(conn)
+    generate_journal(conn, end_day - days + 1, end_day)
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmarks.generate', description="Build a synthetic inventory database")
+    parser.add_argument('--db', default='benchmarks/bench.db')
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--sales', type=int, default=10000000)
+    parser.add_argument('--days', type=int, default=365, help="days of sales history ending today")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    def progress(done):
+        print(f"\r{done:,} of {args.sales:,} sales", end='', flush=True)
+
+    seconds = generate(args.db, args.items, args.sales, args.days, args.seed, progress=progress)
+    print(f"\nWrote {args.items:,} items and {args.sales:,} sales to {args.db} in {seconds:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
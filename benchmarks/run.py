@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, timedelta
+
+from inventory_core import InventoryCheck, InventoryRepository, export_table, import_csv
+from inventory_core.timeutil import MICROS_PER_SECOND, to_micros
+
+# Times the inventory hot paths headlessly against a copy of a generated
+# database and writes the results as JSON. Passing an earlier results file
+# with --compare prints how each benchmark moved since then.
+
+SEARCH_TERMS = ['tom', 'fresh chick', 'salmon', 'o', 'spicy pep', 'bread 12']
+
+# Qt needs an application object for the item model benchmark
+qt_app = None
+
+
+def timed(func, repeat):
+    # Returns min, median and max seconds over repeat runs
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': statistics.median(times), 'max': max(times), 'runs': repeat}
+
+
+def item_model_benchmark(repository):
+    # Builds the inventory table's model over a freshly loaded item store, as
+    # the window does on start-up; None when PyQt5 is not installed
+    global qt_app
+    try:
+        from PyQt5.QtCore import QCoreApplication
+    except ImportError:
+        return None
+    from item_model import ItemTableModel
+    qt_app = QCoreApplication.instance() or QCoreApplication([])
+
+    def populate():
+        repository.item_store.invalidate()
+        ItemTableModel(repository).reload()
+    return populate
+
+
+def run_benchmarks(path, repeat=5, workdir=None):
+    results = {}
+    repository = InventoryRepository(path)
+    with repository.connection() as conn:
+        items = conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        sales = conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+        item_ids = [row[0] for row in conn.execute("SELECT item_id FROM items ORDER BY random() LIMIT 200")]
+
+    def bench(name, func, runs=repeat):
+        results[name] = timed(func, runs)
+        print(f"{name:32} {results[name]['median'] * 1000:10.1f} ms")
+
+    populate = item_model_benchmark(repository)
+    if populate is not None:
+        bench('populate_item_list', populate)
+    bench('load_item_store', lambda: (repository.item_store.invalidate(), repository.items()))
+    bench('sort_item_ids_by_quantity', lambda: repository.items().sorted_ids(2, True))
+    bench('search_items', lambda: [repository.search_item_ids(term) for term in SEARCH_TERMS])
+
+    # The first check reads the whole rollup; later ones only new sales. Low
+    # stock comes from the item store, as in the app.
+    store = repository.items()
+    with repository.connection() as conn:
+        bench('check_quantities_first', lambda: InventoryCheck(7).run(conn, 10, store))
+        check = InventoryCheck(7)
+        check.run(conn, 10, store)
+        bench('check_quantities_incremental', lambda: check.run(conn, 10, store))
+
+    # Reports bypass the result cache so the queries themselves are timed
+    today = date.today()
+    month_start, month_end = to_micros(today - timedelta(days=29)), to_micros(today + timedelta(days=1))
+    bench('sales_report_last_30_days', lambda: repository.query_sales_report(month_start, month_end))
+    # From noon a week ago to 3pm today: partial days at both ends
+    week_start = to_micros(today - timedelta(days=7)) + 12 * 3600 * MICROS_PER_SECOND
+    week_end = to_micros(today) + 15 * 3600 * MICROS_PER_SECOND
+    bench('sales_report_partial_days', lambda: repository.query_sales_report(week_start, week_end))
+    bench('demand_forecast', lambda: repository.query_demand_forecast(), runs=max(1, repeat // 2))
+    # Mid-month, the furthest from the monthly snapshots the generator leaves
+    mid_month = to_micros(today.replace(day=1) - timedelta(days=16))
+    bench('stock_at_mid_last_month', lambda: repository.query_stock_at(mid_month))
+
+    export_path = os.path.join(workdir, 'items.csv')
+    bench('export_items_csv', lambda: export_table(repository, 'items', export_path), runs=max(1, repeat // 2))
+    bench('export_sales_30_days_csv', lambda: export_table(
+        repository, 'sales', os.path.join(workdir, 'sales.csv'), start=today - timedelta(days=29)), runs=max(1, repeat // 2))
+    bench('import_items_csv_unchanged', lambda: import_csv(repository, export_path), runs=max(1, repeat // 2))
+
+    # Edits, sales and reorders modify the copy; later reorder runs find
+    # most items already on order, so only the first is timed
+    bench('generate_reorders', lambda: repository.generate_reorders(10), runs=1)
+    bench('take_snapshot', repository.take_snapshot, runs=1)
+    edits = iter(item_ids * (repeat + 1))
+    bench('edit_item_x100', lambda: [repository.update_item(item_id, f"bench {item_id}", "", 100, 1.0)
+                                     for item_id in (next(edits) for _ in range(100))])
+    bench('record_sale_x100', lambda: [repository.record_sale(item_id, 1) for item_id in item_ids[:100]])
+    bench('record_sales_batch_x1000', lambda: repository.record_sales_batch([(item_ids[i % len(item_ids)], 1)
+                                                                             for i in range(1000)]))
+    repository.close()
+    return {'items': items, 'sales': sales, 'results': results}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current):
+    print(f"\n{'benchmark':32} {'before':>10} {'after':>10} {'change':>8}")
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        change = result['median'] / before['median'] - 1 if before['median'] else 0.0
+        print(f"{name:32} {before['median'] * 1000:8.1f}ms {result['median'] * 1000:8.1f}ms {change:+8.0%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmarks.run', description="Time the inventory hot paths")
+    parser.add_argument('--db', default='benchmarks/bench.db', help="database made by benchmarks.generate")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="results file (default: benchmarks/results/<commit>-<time>.json)")
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} does not exist; build it with python -m benchmarks.generate")
+
+    # Work on a copy so the edit benchmarks leave the generated database alone
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'bench.db')
+        source = sqlite3.connect(args.db)
+        copy = sqlite3.connect(path)
+        source.backup(copy)
+        copy.close()
+        source.close()
+        run = run_benchmarks(path, args.repeat, workdir)
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'machine': platform.machine(),
+        **run,
+    }
+    output = args.output or os.path.join('benchmarks', 'results', f"{commit or 'unknown'}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            compare(json.load(file), report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import numpy as np
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
+from PyQt5.QtWidgets import QComboBox, QHBoxLayout, QLabel, QSpinBox, QVBoxLayout, QWidget
+
+# Sales time-series ranges: (title, days back from today or None for all)
+SALES_RANGES = [("All Time", None), ("Last Year", 365), ("Last 90 Days", 90), ("Last 30 Days", 30)]
+
+
+def top_n_with_other(names, values, n):
+    # The n largest values, biggest first, plus the rest summed as "Other"
+    values = np.asarray(values, dtype=float)
+    if len(values) <= n:
+        order = np.argsort(-values, kind='stable')
+        return [names[i] for i in order], values[order]
+    top = np.argpartition(-values, n - 1)[:n]
+    top = top[np.argsort(-values[top], kind='stable')]
+    rest = np.ones(len(values), dtype=bool)
+    rest[top] = False
+    return [names[i] for i in top] + ["Other"], np.append(values[top], values[rest].sum())
+
+
+class ChartWindow(QWidget):
+    # Embedded charts drawn on one matplotlib figure that is kept for the
+    # life of the window. Refreshing updates the existing bars and line in
+    # place; large catalogs are reduced to the top items plus "Other" so
+    # drawing stays fast however many items there are.
+
+    def __init__(self, repository, top_n=20, parent=None):
+        super().__init__(parent)
+        self.repository = repository
+        self.setWindowTitle("Inventory Charts")
+        self.setGeometry(100, 100, 800, 500)
+
+        self.chart_picker = QComboBox()
+        self.chart_picker.addItems(["Stock by Item", "Sales Over Time"])
+        self.top_n_input = QSpinBox()
+        self.top_n_input.setRange(1, 200)
+        self.top_n_input.setValue(top_n)
+        self.range_picker = QComboBox()
+        self.range_picker.addItems([title for title, _ in SALES_RANGES])
+
+        self.figure = Figure(tight_layout=True)
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        self.stock_axes = self.figure.add_subplot(111)
+        self.sales_axes = self.figure.add_subplot(111, label='sales')
+        self.bars = None
+        self.bar_labels = None
+        (self.sales_line,) = self.sales_axes.plot(np.zeros(0, dtype='datetime64[D]'), [])
+        self.sales_axes.set_title("Units Sold per Day")
+        self.sales_axes.set_ylabel("Quantity")
+        self.sales_axes.tick_params(axis='x', labelrotation=30)
+
+        controls = QHBoxLayout()
+        controls.addWidget(self.chart_picker)
+        controls.addWidget(QLabel("Top items:"))
+        controls.addWidget(self.top_n_input)
+        controls.addWidget(QLabel("Range:"))
+        controls.addWidget(self.range_picker)
+        controls.addStretch()
+        layout = QVBoxLayout()
+        layout.addLayout(controls)
+        layout.addWidget(self.canvas)
+        self.setLayout(layout)
+
+        self.chart_picker.currentIndexChanged.connect(self.refresh)
+        self.top_n_input.valueChanged.connect(self.refresh)
+        self.range_picker.currentIndexChanged.connect(self.refresh)
+
+    def refresh(self):
+        stock = self.chart_picker.currentIndex() == 0
+        self.stock_axes.set_visible(stock)
+        self.sales_axes.set_visible(not stock)
+        self.top_n_input.setEnabled(stock)
+        self.range_picker.setEnabled(not stock)
+        if stock:
+            self.draw_stock()
+        else:
+            self.draw_sales()
+        self.canvas.draw_idle()
+
+    def draw_stock(self):
+        names, quantities = self.repository.items().names_and_quantities()
+        labels, values = top_n_with_other(names, quantities, self.top_n_input.value())
+
+        if self.bars is not None and len(self.bars) == len(labels):
+            # Same number of bars: only their lengths and labels change
+            for bar, value in zip(self.bars, values):
+                bar.set_width(value)
+        else:
+            self.stock_axes.cla()
+            self.bars = self.stock_axes.barh(np.arange(len(labels)), values, align='center', alpha=0.5)
+            self.stock_axes.invert_yaxis()
+            self.stock_axes.set_xlabel('Quantity')
+            self.stock_axes.set_title('Inventory Report')
+            self.bar_labels = None
+        if labels != self.bar_labels:
+            self.stock_axes.set_yticks(np.arange(len(labels)))
+            self.stock_axes.set_yticklabels(labels)
+            self.bar_labels = labels
+        self.stock_axes.relim()
+        self.stock_axes.autoscale_view()
+
+    def draw_sales(self):
+        days_back = SALES_RANGES[self.range_picker.currentIndex()][1]
+        days, quantities = self.repository.daily_sales(days_back)
+        if len(days):
+            # Day numbers count from 1970-01-01, the same origin as datetime64
+            first, last = days[0], days[-1]
+            totals = np.zeros(last - first + 1)
+            totals[np.asarray(days) - first] = quantities
+            x = np.arange(first, last + 1).astype('datetime64[D]')
+        else:
+            totals = np.zeros(0)
+            x = np.zeros(0, dtype='datetime64[D]')
+        self.sales_line.set_data(x, totals)
+        self.sales_axes.relim()
+        self.sales_axes.autoscale_view()
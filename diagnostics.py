@@ -0,0 +1,152 @@
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+
+from PyQt5.QtCore import QObject, QTimer
+from PyQt5.QtWidgets import (QFileDialog, QHBoxLayout, QLabel, QPushButton, QTableWidget, QTableWidgetItem,
+                             QVBoxLayout, QWidget)
+
+from inventory_core.metrics import METRICS
+
+SPAN_HEADERS = ["Span", "Count", "Mean ms", "Max ms", "Last ms", "Total ms"]
+
+
+class EventLoopMonitor(QObject):
+    # Samples how late a repeating timer fires. The lag is how long the event
+    # loop was busy with something else, i.e. how long the UI was frozen.
+
+    def __init__(self, interval=100, parent=None):
+        super().__init__(parent)
+        self.interval = interval
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.sample)
+        self.last = None
+
+    def start(self):
+        self.last = time.perf_counter()
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def sample(self):
+        now = time.perf_counter()
+        lag = now - self.last - self.interval / 1000
+        self.last = now
+        METRICS.record('ui.event_loop_lag', max(lag, 0.0))
+
+
+class Profiler:
+    # Opt-in cProfile and tracemalloc captures, switched on and off from the
+    # Settings menu. cProfile only sees the GUI thread.
+
+    def __init__(self):
+        self.profile = None
+
+    def start_profile(self):
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop_profile(self, path):
+        # Saves the stats to path and returns the top functions as text
+        self.profile.disable()
+        self.profile.dump_stats(path)
+        text = io.StringIO()
+        pstats.Stats(self.profile, stream=text).sort_stats('cumulative').print_stats(20)
+        self.profile = None
+        return text.getvalue()
+
+    def start_memory(self):
+        tracemalloc.start(25)
+
+    def stop_memory(self, path):
+        # Saves the biggest allocation sites to path and returns them as text
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        lines = [f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB"]
+        lines += [str(stat) for stat in snapshot.statistics('lineno')[:25]]
+        text = "\n".join(lines)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text + "\n")
+        return text
+
+
+class DiagnosticsTab(QWidget):
+    # Shows the aggregated metrics. extra() returns further sections (cache
+    # and checker statistics) that are shown and saved with them.
+
+    def __init__(self, extra=None, parent=None):
+        super().__init__(parent)
+        self.extra = extra or dict
+
+        self.table = QTableWidget()
+        self.table.setColumnCount(len(SPAN_HEADERS))
+        self.table.setHorizontalHeaderLabels(SPAN_HEADERS)
+        self.table.setSortingEnabled(True)
+        self.summary = QLabel()
+        self.summary.setWordWrap(True)
+
+        refresh_button = QPushButton("Refresh")
+        refresh_button.clicked.connect(self.refresh)
+        reset_button = QPushButton("Reset")
+        reset_button.clicked.connect(self.reset)
+        save_button = QPushButton("Save JSON")
+        save_button.clicked.connect(self.save)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(refresh_button)
+        buttons.addWidget(reset_button)
+        buttons.addWidget(save_button)
+        buttons.addStretch()
+        layout = QVBoxLayout()
+        layout.addLayout(buttons)
+        layout.addWidget(self.table)
+        layout.addWidget(self.summary)
+        self.setLayout(layout)
+
+        # Keep the numbers current while the tab is on screen
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(2000)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        snapshot = METRICS.snapshot()
+        spans = snapshot['spans']
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(spans))
+        for row, (name, stats) in enumerate(spans.items()):
+            values = [stats['count'], stats['mean_ms'], stats['max_ms'], stats['last_ms'], stats['total_ms']]
+            self.table.setItem(row, 0, QTableWidgetItem(name))
+            for column, value in enumerate(values, start=1):
+                item = QTableWidgetItem()
+                item.setData(0, value if column == 1 else round(value, 2))
+                self.table.setItem(row, column, item)
+        self.table.setSortingEnabled(True)
+
+        lines = ["SQL statements: " + ", ".join(f"{kind} {count:,}" for kind, count in snapshot['statements'].items())]
+        for section, values in self.extra().items():
+            lines.append(f"{section.capitalize()}: " + ", ".join(
+                f"{key} {value:.3g}" if isinstance(value, float) else f"{key} {value}" for key, value in values.items()))
+        self.summary.setText("\n".join(lines))
+
+    def reset(self):
+        METRICS.reset()
+        self.refresh()
+
+    def save(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Metrics", "metrics.json", "JSON Files (*.json)")
+        if path:
+            METRICS.dump(path, **self.extra())
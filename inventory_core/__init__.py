@@ -0,0 +1,13 @@
+# Headless inventory, sales and analytics logic shared by the desktop app and
+# scripts. Nothing here imports Qt, and heavy libraries are only imported by
+# the functions that need them.
+
+from .alerts import alert_message, find_low_stock
+from .checks import InventoryCheck
+from .database import InventoryRepository
+from .demand import DemandTrendEngine
+from .exporter import export_format, export_table
+from .forecast import forecast_demand
+from .importer import import_csv
+from .locations import SiteGroup
+from .schema import migrate
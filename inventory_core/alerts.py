@@ -0,0 +1,23 @@
+def low_stock_rows(conn, min_qty_threshold):
+    # (name, quantity, threshold) of every low item, lowest stock first. One
+    # pass over items; an item's own min_qty overrides the global threshold.
+    c = conn.cursor()
+    c.execute("SELECT name, quantity, COALESCE(min_qty, ?) FROM items WHERE quantity < COALESCE(min_qty, ?) "
+              "ORDER BY quantity, name", (min_qty_threshold, min_qty_threshold))
+    return c.fetchall()
+
+
+def find_low_stock(conn, min_qty_threshold):
+    return [row[0] for row in low_stock_rows(conn, min_qty_threshold)]
+
+
+def summarize_items(items, limit=5):
+    # Collapse a long list of item names into a single line for the tray
+    if len(items) <= limit:
+        return ", ".join(items)
+    return f"{', '.join(items[:limit])} and {len(items) - limit} more"
+
+
+def alert_message(items, text):
+    verb = "is" if len(items) == 1 else "are"
+    return f"{summarize_items(items)} {verb} {text}"
@@ -0,0 +1,53 @@
+import threading
+from collections import OrderedDict
+
+# Results of report and chart queries, kept until the data changes. Each
+# entry remembers the repository's data version it was computed at; the
+# version goes up with every committed write, so a stale entry is never
+# served. Least recently used entries are dropped past max_entries.
+
+
+class ResultCache:
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, version, compute):
+        # The cached result for key if it was computed at version, otherwise
+        # compute() stored under version. Read the version before computing
+        # so a write during compute() leaves the entry already stale.
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == version:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = compute()
+        with self.lock:
+            self.entries[key] = (version, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
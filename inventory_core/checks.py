@@ -0,0 +1,25 @@
+from .alerts import find_low_stock
+from .demand import DemandTrendEngine
+from .metrics import METRICS
+
+
+class InventoryCheck:
+    # The periodic inventory analysis: demand trends plus low stock. The
+    # demand engine is kept between runs so each run only reads new sales.
+
+    def __init__(self, window_size=1):
+        self.demand_engine = DemandTrendEngine(window_size)
+
+    def run(self, conn, min_qty_threshold, item_store=None):
+        # Returns the high-demand items and the low-stock items. Low stock is
+        # read from the item store when one is given.
+        with METRICS.span('check.demand_update'):
+            self.demand_engine.update(conn)
+        with METRICS.span('check.high_demand'):
+            high_demand = self.demand_engine.high_demand_items()
+        with METRICS.span('check.low_stock'):
+            if item_store is None:
+                low_stock = find_low_stock(conn, min_qty_threshold)
+            else:
+                low_stock = item_store.low_stock(min_qty_threshold)
+        return high_demand, low_stock
@@ -0,0 +1,218 @@
+import argparse
+import csv
+import json
+import os
+import sys
+
+from .database import InventoryRepository
+from .exporter import EXPORT_TABLES, export_table
+from .importer import import_csv
+from .locations import SiteGroup
+from .server import serve
+
+
+def read_deltas(path):
+    # A CSV with an item_id or name column and a delta column. Raises
+    # ValueError naming the line of the first bad row; nothing is applied.
+    with open(path, mode='r', newline='', encoding='utf-8-sig') as file:
+        reader = csv.DictReader(file)
+        fields = {field.strip().lower(): field for field in reader.fieldnames or []}
+        if 'delta' not in fields or not ('item_id' in fields or 'name' in fields):
+            raise ValueError("The file needs a delta column and an item_id or name column")
+
+        def field(row, column):
+            # Short rows leave missing columns None
+            return (row.get(fields[column]) or '').strip() if column in fields else ''
+
+        for row in reader:
+            line = reader.line_num
+            delta = field(row, 'delta')
+            try:
+                delta = int(delta)
+            except ValueError:
+                raise ValueError(f"line {line}: Delta {delta!r} is not a whole number")
+            item_id = field(row, 'item_id')
+            if item_id:
+                try:
+                    item_id = int(item_id)
+                except ValueError:
+                    raise ValueError(f"line {line}: Item id {item_id!r} is not a whole number")
+                yield item_id, delta
+                continue
+            name = field(row, 'name')
+            if not name:
+                raise ValueError(f"line {line}: The row has no item id or name")
+            yield name, delta
+
+
+def apply_deltas(repository, args):
+    changed, unknown = repository.apply_stock_deltas(read_deltas(args.file), record_sales=not args.no_sales)
+    print(f"Updated {changed} items")
+    for item in unknown:
+        print(f"Unknown item: {item}", file=sys.stderr)
+    return 1 if unknown else 0
+
+
+def parse_site(text):
+    # NAME=PATH, or a path named after its file
+    name, _, path = text.rpartition('=')
+    return name or os.path.splitext(os.path.basename(path))[0], path
+
+
+def report(repository, args):
+    # With --site the report covers this database and every site, with a
+    # quantity column per site
+    names = []
+    errors = {}
+    if args.site:
+        sites = [(os.path.splitext(os.path.basename(repository.path))[0], repository.path)] + args.site
+        names, rows, errors = SiteGroup(sites).sales_report(args.start, args.end)
+    else:
+        rows = repository.sales_report(args.start, args.end)
+    output = open(args.output, mode='w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        if args.format == 'json':
+            if names:
+                records = [{'item_name': row[0], 'quantity': row[1], 'sites': dict(zip(names, row[2:]))} for row in rows]
+            else:
+                records = [{'item_name': name, 'quantity': quantity} for name, quantity in rows]
+            json.dump(records, output, indent=2)
+            output.write("\n")
+        else:
+            writer = csv.writer(output)
+            writer.writerow(['Item Name', 'Total Quantity Used'] + names)
+            writer.writerows(rows)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    for name, error in errors.items():
+        print(f"Site {name} could not be read: {error}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def import_items(repository, args):
+    result = import_csv(repository, args.file)
+    print(result.summary())
+    return 1 if result.rejected else 0
+
+
+def export(repository, args):
+    columns = args.columns.split(',') if args.columns else None
+    rows = export_table(repository, args.table, args.file, columns=columns, start=args.start, end=args.end)
+    print(f"Exported {rows} rows to {args.file}")
+    return 0
+
+
+def backfill(repository, args):
+    print(f"Rebuilt {repository.backfill_sales_daily()} daily sales totals")
+    return 0
+
+
+def migrate(repository, args):
+    # Opening the repository already brought the schema up to date
+    print(f"{repository.path} is up to date")
+    return 0
+
+
+def reorder(repository, args):
+    orders, lines = repository.generate_reorders(args.min_qty, history_days=args.history_days,
+                                                 safety_days=args.safety_days, cover_days=args.cover_days)
+    print(f"Added {lines} lines to {orders} draft purchase orders")
+    return 0
+
+
+def snapshot(repository, args):
+    levels, pruned = repository.take_snapshot()
+    print(f"Saved a snapshot of {levels} stock levels; removed {pruned} old snapshots")
+    return 0
+
+
+def stock_at(repository, args):
+    output = open(args.output, mode='w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        writer = csv.writer(output)
+        writer.writerow(['Item ID', 'Item Name', 'Quantity'])
+        writer.writerows(repository.stock_at(args.time))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+def run_server(repository, args):
+    # One pooled connection per reader thread plus one for the writer
+    repository.pool_size = args.readers + 1
+    serve(repository, args.host, args.port, args.readers)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='inventory_core', description="Batch operations on the inventory database")
+    parser.add_argument('--db', default='inventory.db', help="database file (default: inventory.db)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('apply-deltas', help="apply stock changes from a CSV file in one transaction")
+    command.add_argument('file', help="CSV with an item_id or name column and a delta column")
+    command.add_argument('--no-sales', action='store_true', help="do not record negative deltas as sales")
+    command.set_defaults(run=apply_deltas)
+
+    command = commands.add_parser('report', help="stock used per item from start up to, not including, end")
+    command.add_argument('--start', required=True, help="start day or time, e.g. 2023-03-01")
+    command.add_argument('--end', required=True, help="end day or time, not included, e.g. 2023-04-01")
+    command.add_argument('--format', choices=('csv', 'json'), default='csv')
+    command.add_argument('--output', help="write to this file instead of standard output")
+    command.add_argument('--site', action='append', type=parse_site, metavar='NAME=PATH',
+                         help="also total another site's database, opened read-only; repeatable")
+    command.set_defaults(run=report)
+
+    command = commands.add_parser('import', help="import items from a CSV file")
+    command.add_argument('file')
+    command.set_defaults(run=import_items)
+
+    command = commands.add_parser('export', help="export a table to CSV, gzip CSV or Parquet")
+    command.add_argument('table', choices=sorted(EXPORT_TABLES))
+    command.add_argument('file', help="output file; the extension picks the format")
+    command.add_argument('--columns', help="comma separated column names")
+    command.add_argument('--start', help="only rows at or after this time")
+    command.add_argument('--end', help="only rows before this time")
+    command.set_defaults(run=export)
+
+    command = commands.add_parser('backfill', help="rebuild the daily sales rollup from the sales table")
+    command.set_defaults(run=backfill)
+
+    command = commands.add_parser('migrate', help="create or upgrade the database schema")
+    command.set_defaults(run=migrate)
+
+    command = commands.add_parser('reorder', help="draft purchase orders for items below their reorder point")
+    command.add_argument('--min-qty', type=int, default=10, help="minimum quantity for items without their own")
+    command.add_argument('--history-days', type=int, default=28, help="days of sales to average demand over")
+    command.add_argument('--safety-days', type=int, default=3, help="days of demand kept beyond the lead time")
+    command.add_argument('--cover-days', type=int, default=14, help="days of demand each order covers")
+    command.set_defaults(run=reorder)
+
+    command = commands.add_parser('snapshot', help="save a snapshot of every item's stock level")
+    command.set_defaults(run=snapshot)
+
+    command = commands.add_parser('stock-at', help="stock of every item as it stood at a time")
+    command.add_argument('time', help="day or time, e.g. 2023-03-06 for the end of March 5")
+    command.add_argument('--output', help="write to this file instead of standard output")
+    command.set_defaults(run=stock_at)
+
+    command = commands.add_parser('serve', help="serve the inventory over HTTP/JSON for other terminals")
+    command.add_argument('--host', default='127.0.0.1')
+    command.add_argument('--port', type=int, default=8080)
+    command.add_argument('--readers', type=int, default=4, help="threads serving read requests")
+    command.set_defaults(run=run_server)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    repository = InventoryRepository(args.db)
+    try:
+        return args.run(repository, args)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        repository.close()
@@ -0,0 +1,579 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date
+
+from .cache import ResultCache
+from .forecast import forecast_demand
+from .itemstore import ITEM_ROW, ItemChanges, ItemStore
+from .journal import MOVEMENT_KINDS, prune_snapshots, record_movement, snapshot_due, stock_at, take_snapshot
+from .metrics import METRICS, timed
+from .purchasing import OPEN_STATUSES, ORDER_STATUSES, generate_reorders
+from .schema import backfill_sales_daily, migrate
+from .timeutil import MICROS_PER_DAY, now_micros, to_day, to_micros
+
+
+def sales_report_rows(conn, start, end):
+    # (item name, quantity sold) for the half-open micros range [start, end)
+    first_day = -(-start // MICROS_PER_DAY)
+    last_day = end // MICROS_PER_DAY
+    raw = "SELECT item_name, quantity_sold AS qty FROM sales WHERE time_sold >= ? AND time_sold < ?"
+    if first_day >= last_day:
+        parts = [raw]
+        params = [start, end]
+    else:
+        parts = [raw, "SELECT item_name, qty FROM sales_daily WHERE day >= ? AND day < ?", raw]
+        params = [start, first_day * MICROS_PER_DAY, first_day, last_day, last_day * MICROS_PER_DAY, end]
+    return conn.execute(f"SELECT item_name, SUM(qty) FROM ({' UNION ALL '.join(parts)}) "
+                        f"WHERE item_name IS NOT NULL GROUP BY item_name ORDER BY item_name", params).fetchall()
+
+
+class InventoryRepository:
+    # All database access for the application goes through this class. It
+    # keeps a small pool of long-lived connections in WAL mode so readers
+    # (like the background checker) never wait on the GUI's writes.
+
+    def __init__(self, path='inventory.db', pool_size=4):
+        self.path = path
+        self.pool_size = pool_size
+        self.pool = queue.LifoQueue()
+        self.connections = []
+        self.lock = threading.Lock()
+
+        # Bumped after every committed write, ours or another process's;
+        # cached report and chart results computed at an older version are
+        # recomputed
+        self.data_version = 0
+        self.cache = ResultCache()
+
+        # Items shared by the table, chart and checks, patched as writes
+        # commit. Each thread's open transaction collects its changes in
+        # local.
+        self.item_store = ItemStore()
+        self.local = threading.local()
+
+        # Every write goes through one writer connection, a transaction at a
+        # time, which also keeps item store patches in commit order. The
+        # writer's PRAGMA data_version only moves when another connection
+        # commits, so a change in it is a write from another process.
+        # external_changes counts the ones noticed.
+        self.write_lock = threading.Lock()
+        self.writer = None
+        self.seen_version = None
+        self.external_changes = 0
+
+        # Create or upgrade the database schema
+        with self.write_lock:
+            migrate(self.writer_connection())
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, cached_statements=256)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA cache_size = -16000")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.set_trace_callback(METRICS.count_statement)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        # Borrow a pooled connection, opening a new one while under pool_size
+        try:
+            conn = self.pool.get_nowait()
+        except queue.Empty:
+            with self.lock:
+                conn = None
+                if len(self.connections) < self.pool_size:
+                    conn = self.connect()
+                    self.connections.append(conn)
+            if conn is None:
+                conn = self.pool.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self.pool.put(conn)
+
+    def writer_connection(self):
+        # Opened on first use; only touch it with the write lock held
+        if self.writer is None:
+            self.writer = self.connect()
+            self.seen_version = self.writer.execute("PRAGMA data_version").fetchone()[0]
+        return self.writer
+
+    def check_external_writes(self, conn):
+        # With the write lock held: drop the item store and cached results if
+        # another process has committed since the last check, and return
+        # whether it had
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self.seen_version:
+            return False
+        self.seen_version = version
+        self.item_store.invalidate()
+        with self.lock:
+            self.data_version += 1
+            self.external_changes += 1
+        return True
+
+    @contextmanager
+    def transaction(self):
+        # Waits for the writer as long as SQLite waits for a busy database
+        if not self.write_lock.acquire(timeout=10):
+            raise sqlite3.OperationalError("database is locked")
+        try:
+            conn = self.writer_connection()
+            conn.execute("BEGIN IMMEDIATE")
+            # Nothing else can commit now until this transaction does
+            self.check_external_writes(conn)
+            changes = self.local.changes = ItemChanges()
+            try:
+                yield conn.cursor()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                self.local.changes = None
+            try:
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            # The write stands even if patching the item store fails
+            try:
+                self.item_store.apply(changes)
+            finally:
+                with self.lock:
+                    self.data_version += 1
+        finally:
+            if self.writer is not None and self.writer.in_transaction:
+                self.writer.rollback()
+            self.write_lock.release()
+
+    def items_changed(self, c, where=None, params=()):
+        # Inside a write transaction, after the write: the items matching
+        # where are patched into the item store once it commits. Without
+        # where the store is reloaded instead.
+        changes = self.local.changes
+        if where is None:
+            changes.reload = True
+        else:
+            changes.rows.extend(c.execute(f"{ITEM_ROW} WHERE {where}", params).fetchall())
+
+    def cached(self, key, compute):
+        # Result of compute(), reused until the next write from this or
+        # another process
+        self.sync_items()
+        return self.cache.get(key, self.data_version, compute)
+
+    def close(self):
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections = []
+            self.pool = queue.LifoQueue()
+        with self.write_lock:
+            if self.writer is not None:
+                self.writer.close()
+                self.writer = None
+        self.item_store.invalidate()
+
+    # Items
+
+    @timed('db.list_items')
+    def list_items(self):
+        with self.connection() as conn:
+            return conn.execute("SELECT item_id, name, description, quantity, price, time FROM items").fetchall()
+
+    @timed('db.get_items')
+    def get_items(self, item_ids):
+        # Rows for the given ids, in the same order as the ids
+        with self.connection() as conn:
+            placeholders = ", ".join("?" * len(item_ids))
+            rows = conn.execute(f"SELECT item_id, name, description, quantity, price, time FROM items "
+                                f"WHERE item_id IN ({placeholders})", list(item_ids)).fetchall()
+        by_id = {row[0]: row for row in rows}
+        return [by_id[item_id] for item_id in item_ids if item_id in by_id]
+
+    @timed('db.items_page')
+    def items_page(self, after_id, limit):
+        # Up to limit items with ids above after_id, for keyset paging
+        with self.connection() as conn:
+            return conn.execute("SELECT item_id, name, description, quantity, price, time FROM items "
+                                "WHERE item_id > ? ORDER BY item_id LIMIT ?", (after_id, limit)).fetchall()
+
+    @timed('db.search_item_ids')
+    def search_item_ids(self, text):
+        # Ids of items whose name or description has words starting with
+        # every term in text; None when there is nothing to search for
+        terms = text.split()
+        if not terms:
+            return None
+        query = " ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+        with self.connection() as conn:
+            return {row[0] for row in conn.execute("SELECT rowid FROM items_fts WHERE items_fts MATCH ?", (query,))}
+
+    def items(self):
+        # The item store, loaded on first use
+        if not self.item_store.loaded:
+            with self.connection() as conn:
+                self.item_store.load(conn)
+        return self.item_store
+
+    @timed('db.sync_items')
+    def sync_items(self):
+        # Notice writes from another process, dropping the item store and
+        # cached results; returns whether there were any. Skipped while one
+        # of our transactions is open, as it checks on its own.
+        if not self.write_lock.acquire(blocking=False):
+            return False
+        try:
+            return self.check_external_writes(self.writer_connection())
+        finally:
+            self.write_lock.release()
+
+    @timed('db.add_item')
+    def add_item(self, name, description, quantity, price, min_qty=None):
+        # Returns the new item's id and the time it was added, in micros
+        current_time = now_micros()
+        with self.transaction() as c:
+            c.execute("INSERT INTO items (name, description, quantity, price, time, min_qty) VALUES (?, ?, ?, ?, ?, ?)",
+                      (name, description, quantity, price, current_time, min_qty))
+            item_id = c.lastrowid
+            record_movement(c, current_time, item_id, name, 'opening', quantity or 0)
+            self.items_changed(c, "item_id = ?", (item_id,))
+            return item_id, current_time
+
+    @timed('db.update_item')
+    def update_item(self, item_id, name, description, quantity, price, reason='sale'):
+        # A change in quantity is journalled as a movement of the reason's
+        # kind. With the default reason a drop is recorded as a sale in the
+        # same transaction and a rise as an adjustment. Returns the time of
+        # the change.
+        if reason not in MOVEMENT_KINDS:
+            raise ValueError(f"Unknown stock movement {reason}")
+        current_time = now_micros()
+        with self.transaction() as c:
+            c.execute("SELECT quantity FROM items WHERE item_id = ?", (item_id,))
+            row = c.fetchone()
+            c.execute("UPDATE items SET name = ?, description = ?, quantity = ?, price = ?, time = ? WHERE item_id = ?",
+                      (name, description, quantity, price, current_time, item_id))
+            delta = 0 if row is None else quantity - (row[0] or 0)
+            if delta > 0 and reason == 'sale':
+                reason = 'adjustment'
+            if delta != 0:
+                record_movement(c, current_time, item_id, name, reason, delta)
+            if reason == 'sale' and delta < 0 and row[0] is not None:
+                self.insert_sale(c, item_id, name, -delta, current_time)
+            self.items_changed(c, "item_id = ?", (item_id,))
+        return current_time
+
+    @timed('db.delete_item')
+    def delete_item(self, item_id):
+        # The journal takes the item's stock back to zero
+        with self.transaction() as c:
+            c.execute("INSERT INTO stock_movements (time, item_id, item_name, kind, delta) "
+                      "SELECT ?, item_id, name, 'delete', -COALESCE(quantity, 0) FROM items WHERE item_id = ?",
+                      (now_micros(), item_id))
+            c.execute("DELETE FROM items WHERE item_id = ?", (item_id,))
+            self.local.changes.removed.append(item_id)
+
+    # Sales
+
+    def insert_sale(self, c, item_id, item_name, quantity, time_sold):
+        # Every sale also goes into the daily rollup in the same transaction
+        c.execute("INSERT INTO sales (item_id, item_name, quantity_sold, time_sold) VALUES (?, ?, ?, ?)",
+                  (item_id, item_name, quantity, time_sold))
+        c.execute("INSERT INTO sales_daily (day, item_name, qty) VALUES (?, ?, ?) "
+                  "ON CONFLICT (day, item_name) DO UPDATE SET qty = qty + excluded.qty",
+                  (to_day(time_sold), item_name, quantity))
+
+    def record_sale(self, item_id, quantity):
+        # Take the sold quantity off the item and log the sale atomically
+        current_time, unknown = self.record_sales_batch([(item_id, quantity)])
+        if unknown:
+            raise KeyError(item_id)
+        return current_time
+
+    @timed('db.record_sales_batch')
+    def record_sales_batch(self, sales):
+        # Record many (item_id, quantity) sales in one transaction: one sales
+        # row each, quantities taken off the items and the daily rollup
+        # updated. Returns the time of the sales and the ids not found.
+        current_time = now_micros()
+        with self.transaction() as c:
+            c.execute("CREATE TEMP TABLE IF NOT EXISTS sale_batch (item_id integer, quantity integer)")
+            c.execute("DELETE FROM temp.sale_batch")
+            c.executemany("INSERT INTO temp.sale_batch VALUES (?, ?)", sales)
+            c.execute("SELECT DISTINCT item_id FROM temp.sale_batch WHERE item_id NOT IN (SELECT item_id FROM items)")
+            unknown = [row[0] for row in c.fetchall()]
+
+            c.execute("UPDATE items SET quantity = COALESCE(items.quantity, 0) - totals.quantity, time = ? "
+                      "FROM (SELECT item_id, SUM(quantity) AS quantity FROM temp.sale_batch GROUP BY item_id) AS totals "
+                      "WHERE items.item_id = totals.item_id", (current_time,))
+            c.execute("INSERT INTO sales (item_id, item_name, quantity_sold, time_sold) "
+                      "SELECT items.item_id, items.name, batch.quantity, ? FROM temp.sale_batch AS batch "
+                      "JOIN items ON items.item_id = batch.item_id ORDER BY batch.rowid", (current_time,))
+            c.execute("INSERT INTO stock_movements (time, item_id, item_name, kind, delta) "
+                      "SELECT ?, items.item_id, items.name, 'sale', -batch.quantity FROM temp.sale_batch AS batch "
+                      "JOIN items ON items.item_id = batch.item_id ORDER BY batch.rowid", (current_time,))
+            c.execute("INSERT INTO sales_daily (day, item_name, qty) "
+                      "SELECT ?, items.name, SUM(batch.quantity) FROM temp.sale_batch AS batch "
+                      "JOIN items ON items.item_id = batch.item_id WHERE true GROUP BY items.name "
+                      "ON CONFLICT (day, item_name) DO UPDATE SET qty = qty + excluded.qty", (to_day(current_time),))
+            self.items_changed(c, "item_id IN (SELECT item_id FROM temp.sale_batch)")
+            c.execute("DELETE FROM temp.sale_batch")
+        return current_time, unknown
+
+    @timed('db.apply_stock_deltas')
+    def apply_stock_deltas(self, deltas, record_sales=True):
+        # Apply (item, delta) pairs, where item is an item id or a name, in one
+        # set-based transaction. Negative totals are recorded as sales.
+        # Returns the number of items changed and the items not found.
+        current_time = now_micros()
+        with self.transaction() as c:
+            c.execute("CREATE TEMP TABLE IF NOT EXISTS stock_deltas (item_id integer, name text, delta integer)")
+            c.execute("DELETE FROM temp.stock_deltas")
+            c.executemany("INSERT INTO temp.stock_deltas VALUES (?, ?, ?)",
+                          ((item, None, delta) if isinstance(item, int) else (None, item, delta) for item, delta in deltas))
+            c.execute("UPDATE temp.stock_deltas SET item_id = (SELECT MIN(item_id) FROM items WHERE items.name = stock_deltas.name) "
+                      "WHERE item_id IS NULL")
+            c.execute("SELECT COALESCE(name, item_id) FROM temp.stock_deltas "
+                      "WHERE item_id IS NULL OR item_id NOT IN (SELECT item_id FROM items)")
+            unknown = [row[0] for row in c.fetchall()]
+
+            totals = "(SELECT item_id, SUM(delta) AS delta FROM temp.stock_deltas WHERE item_id IS NOT NULL GROUP BY item_id) AS totals"
+            c.execute(f"UPDATE items SET quantity = COALESCE(quantity, 0) + totals.delta, time = ? FROM {totals} "
+                      f"WHERE items.item_id = totals.item_id", (current_time,))
+            changed = c.rowcount
+            c.execute(f"INSERT INTO stock_movements (time, item_id, item_name, kind, delta) "
+                      f"SELECT ?, items.item_id, items.name, "
+                      f"CASE WHEN ? AND totals.delta < 0 THEN 'sale' ELSE 'adjustment' END, totals.delta "
+                      f"FROM {totals} JOIN items ON items.item_id = totals.item_id WHERE totals.delta != 0 "
+                      f"ORDER BY items.item_id", (current_time, record_sales))
+            if record_sales:
+                c.execute(f"INSERT INTO sales (item_id, item_name, quantity_sold, time_sold) "
+                          f"SELECT items.item_id, items.name, -totals.delta, ? FROM {totals} "
+                          f"JOIN items ON items.item_id = totals.item_id WHERE totals.delta < 0", (current_time,))
+                c.execute(f"INSERT INTO sales_daily (day, item_name, qty) "
+                          f"SELECT ?, items.name, SUM(-totals.delta) FROM {totals} "
+                          f"JOIN items ON items.item_id = totals.item_id WHERE totals.delta < 0 GROUP BY items.name "
+                          f"ON CONFLICT (day, item_name) DO UPDATE SET qty = qty + excluded.qty", (to_day(current_time),))
+            self.items_changed(c, "item_id IN (SELECT item_id FROM temp.stock_deltas)")
+            c.execute("DELETE FROM temp.stock_deltas")
+        return changed, unknown
+
+    def sales_report(self, start, end):
+        # Totals per item sold in the half-open range [start, end). start and
+        # end are dates, datetimes, ISO 8601 text or micros. Whole days are
+        # read from the daily rollup; partial days at either end are summed
+        # from sales with a range scan of the covering time index.
+        start, end = to_micros(start), to_micros(end)
+        return self.cached(('sales_report', start, end), lambda: self.query_sales_report(start, end))
+
+    @timed('db.query_sales_report')
+    def query_sales_report(self, start, end):
+        with self.connection() as conn:
+            return sales_report_rows(conn, start, end)
+
+    def daily_sales(self, days_back=None):
+        # Units sold per day with sales, as (day numbers, quantities), over
+        # the last days_back days up to today or over all time
+        first_day = None if days_back is None else to_day(date.today()) - days_back + 1
+        return self.cached(('daily_sales', first_day), lambda: self.query_daily_sales(first_day))
+
+    @timed('db.query_daily_sales')
+    def query_daily_sales(self, first_day):
+        sql = "SELECT day, SUM(qty) FROM sales_daily"
+        params = []
+        if first_day is not None:
+            sql += " WHERE day >= ?"
+            params.append(first_day)
+        with self.connection() as conn:
+            rows = conn.execute(sql + " GROUP BY day ORDER BY day", params).fetchall()
+        return [day for day, _ in rows], [qty for _, qty in rows]
+
+    def demand_forecast(self, **options):
+        # Forecast demand, stockout and reorder quantities for every item; see
+        # forecast_demand for the options. The forecast ends today by default,
+        # so the day is part of the key.
+        return self.cached(('demand_forecast', date.today(), tuple(sorted(options.items()))),
+                           lambda: self.query_demand_forecast(**options))
+
+    @timed('db.query_demand_forecast')
+    def query_demand_forecast(self, **options):
+        with self.connection() as conn:
+            quantities = conn.execute("SELECT name, quantity FROM items").fetchall()
+            return forecast_demand(conn, quantities, **options)
+
+    # Stock journal
+
+    def stock_at(self, time):
+        # (item_id, name, quantity) of every item as it stood at time (a date,
+        # datetime, ISO 8601 text or micros), after every movement before it
+        time = to_micros(time)
+        return self.cached(('stock_at', time), lambda: self.query_stock_at(time))
+
+    @timed('db.query_stock_at')
+    def query_stock_at(self, time):
+        with self.connection() as conn:
+            return stock_at(conn, time)
+
+    @timed('db.item_movements')
+    def item_movements(self, item_id, limit=500):
+        # (time, kind, delta, level after) of an item's latest movements,
+        # newest first
+        with self.connection() as conn:
+            return conn.execute("SELECT time, kind, delta, level FROM "
+                                "(SELECT movement_id, time, kind, delta, SUM(delta) OVER (ORDER BY movement_id) AS level "
+                                " FROM stock_movements WHERE item_id = ?) "
+                                "ORDER BY movement_id DESC LIMIT ?", (item_id, limit)).fetchall()
+
+    @timed('db.take_snapshot')
+    def take_snapshot(self):
+        # Snapshot every item's level and thin out old snapshots; returns
+        # the number of levels saved and the number of snapshots removed
+        current_time = now_micros()
+        with self.transaction() as c:
+            _, levels = take_snapshot(c.connection, current_time)
+            return levels, prune_snapshots(c.connection, current_time)
+
+    def snapshot_if_due(self):
+        # Take a snapshot when one is due (see journal.snapshot_due); returns
+        # whether one was taken. Checked outside a transaction so the
+        # frequent checks do not count as writes.
+        with self.connection() as conn:
+            if not snapshot_due(conn, now_micros()):
+                return False
+        self.take_snapshot()
+        return True
+
+    # Suppliers and purchase orders
+
+    @timed('db.suppliers_page')
+    def suppliers_page(self, after_id, limit):
+        # (supplier_id, name, contact, lead time, number of items) for up to
+        # limit suppliers with ids above after_id
+        with self.connection() as conn:
+            return conn.execute("SELECT supplier_id, name, contact, lead_time_days, "
+                                "(SELECT COUNT(*) FROM items WHERE items.supplier_id = suppliers.supplier_id) "
+                                "FROM suppliers WHERE supplier_id > ? ORDER BY supplier_id LIMIT ?",
+                                (after_id, limit)).fetchall()
+
+    def supplier_names(self):
+        # (supplier_id, name) for every supplier, by name
+        with self.connection() as conn:
+            return conn.execute("SELECT supplier_id, name FROM suppliers ORDER BY name, supplier_id").fetchall()
+
+    @timed('db.add_supplier')
+    def add_supplier(self, name, contact=None, lead_time_days=7):
+        with self.transaction() as c:
+            c.execute("INSERT INTO suppliers (name, contact, lead_time_days) VALUES (?, ?, ?)",
+                      (name, contact, lead_time_days))
+            return c.lastrowid
+
+    @timed('db.update_supplier')
+    def update_supplier(self, supplier_id, name, contact, lead_time_days):
+        with self.transaction() as c:
+            c.execute("UPDATE suppliers SET name = ?, contact = ?, lead_time_days = ? WHERE supplier_id = ?",
+                      (name, contact, lead_time_days, supplier_id))
+
+    @timed('db.delete_supplier')
+    def delete_supplier(self, supplier_id):
+        # Its items and orders are kept without a supplier
+        with self.transaction() as c:
+            c.execute("DELETE FROM suppliers WHERE supplier_id = ?", (supplier_id,))
+
+    def item_supplier(self, item_id):
+        with self.connection() as conn:
+            row = conn.execute("SELECT supplier_id FROM items WHERE item_id = ?", (item_id,)).fetchone()
+        return None if row is None else row[0]
+
+    @timed('db.set_item_supplier')
+    def set_item_supplier(self, item_id, supplier_id):
+        with self.transaction() as c:
+            c.execute("UPDATE items SET supplier_id = ? WHERE item_id = ?", (supplier_id, item_id))
+
+    def item_min_qty(self, item_id):
+        # The item's own low-stock level, or None when it uses the global
+        # threshold
+        with self.connection() as conn:
+            row = conn.execute("SELECT min_qty FROM items WHERE item_id = ?", (item_id,)).fetchone()
+        return None if row is None else row[0]
+
+    @timed('db.set_item_min_qty')
+    def set_item_min_qty(self, item_id, min_qty):
+        # None goes back to the global threshold
+        with self.transaction() as c:
+            c.execute("UPDATE items SET min_qty = ? WHERE item_id = ?", (min_qty, item_id))
+            self.items_changed(c, "item_id = ?", (item_id,))
+
+    @timed('db.orders_page')
+    def orders_page(self, before_id, limit):
+        # (order_id, supplier name, status, created, lines, total cost) for up
+        # to limit orders, newest first, with ids below before_id (None for
+        # the newest)
+        sql = ("SELECT orders.order_id, suppliers.name, orders.status, orders.created, "
+               "(SELECT COUNT(*) FROM purchase_order_lines AS lines WHERE lines.order_id = orders.order_id), "
+               "(SELECT SUM(lines.quantity * lines.unit_price) FROM purchase_order_lines AS lines "
+               " WHERE lines.order_id = orders.order_id) "
+               "FROM purchase_orders AS orders LEFT JOIN suppliers ON suppliers.supplier_id = orders.supplier_id")
+        params = []
+        if before_id is not None:
+            sql += " WHERE orders.order_id < ?"
+            params.append(before_id)
+        with self.connection() as conn:
+            return conn.execute(sql + " ORDER BY orders.order_id DESC LIMIT ?", params + [limit]).fetchall()
+
+    def order_lines(self, order_id):
+        # (item_id, item name, quantity, unit price) for the lines of an order
+        with self.connection() as conn:
+            return conn.execute("SELECT lines.item_id, items.name, lines.quantity, lines.unit_price "
+                                "FROM purchase_order_lines AS lines LEFT JOIN items ON items.item_id = lines.item_id "
+                                "WHERE lines.order_id = ? ORDER BY items.name", (order_id,)).fetchall()
+
+    @timed('db.generate_reorders')
+    def generate_reorders(self, min_qty=10, **options):
+        # Draft purchase orders for every item below its reorder point; see
+        # purchasing.generate_reorders for the options. Returns the number of
+        # orders and lines added to.
+        with self.transaction() as c:
+            return generate_reorders(c.connection, now_micros(), min_qty, **options)
+
+    @timed('db.set_order_status')
+    def set_order_status(self, order_id, status):
+        # Mark an open order sent or cancelled; returns False when the order
+        # was not open
+        if status not in ORDER_STATUSES or status == 'received':
+            raise ValueError(f"Cannot set an order to {status}")
+        with self.transaction() as c:
+            c.execute("UPDATE purchase_orders SET status = ? WHERE order_id = ? AND status IN (?, ?)",
+                      (status, order_id, *OPEN_STATUSES))
+            return c.rowcount > 0
+
+    @timed('db.receive_order')
+    def receive_order(self, order_id):
+        # Add an open order's quantities to stock and mark it received, in one
+        # transaction. Returns False when the order was not open.
+        current_time = now_micros()
+        with self.transaction() as c:
+            c.execute("UPDATE purchase_orders SET status = 'received', received = ? "
+                      "WHERE order_id = ? AND status IN (?, ?)", (current_time, order_id, *OPEN_STATUSES))
+            if c.rowcount == 0:
+                return False
+            totals = ("(SELECT item_id, SUM(quantity) AS quantity FROM purchase_order_lines "
+                      " WHERE order_id = ? GROUP BY item_id) AS totals")
+            c.execute(f"UPDATE items SET quantity = COALESCE(items.quantity, 0) + totals.quantity, time = ? "
+                      f"FROM {totals} WHERE items.item_id = totals.item_id", (current_time, order_id))
+            c.execute(f"INSERT INTO stock_movements (time, item_id, item_name, kind, delta) "
+                      f"SELECT ?, items.item_id, items.name, 'receipt', totals.quantity FROM {totals} "
+                      f"JOIN items ON items.item_id = totals.item_id ORDER BY items.item_id", (current_time, order_id))
+            self.items_changed(c, "item_id IN (SELECT item_id FROM purchase_order_lines WHERE order_id = ?)", (order_id,))
+        return True
+
+    @timed('db.backfill_sales_daily')
+    def backfill_sales_daily(self):
+        with self.transaction() as c:
+            return backfill_sales_daily(c.connection)
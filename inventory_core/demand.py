@@ -0,0 +1,134 @@
+import math
+from bisect import insort
+
+from .timeutil import MICROS_PER_DAY
+
+
+class ItemTrend:
+    # Running daily totals and least-squares sums for one item. Days are kept
+    # as offsets from the first day seen so every sum stays an exact integer.
+
+    def __init__(self, anchor):
+        self.anchor = anchor
+        self.daily = {}
+        self.days = []
+        self.n = 0
+        self.sum_x = 0
+        self.sum_y = 0
+        self.sum_xy = 0
+        self.sum_xx = 0
+        self.sum_yy = 0
+
+    def add(self, day, qty):
+        x = day - self.anchor
+        old = self.daily.get(x)
+        if old is None:
+            old = 0
+            self.n += 1
+            self.sum_x += x
+            self.sum_xx += x * x
+            insort(self.days, x)
+        new = old + qty
+        self.daily[x] = new
+        self.sum_y += qty
+        self.sum_xy += x * qty
+        self.sum_yy += new * new - old * old
+
+    def fit(self):
+        # Closed-form ordinary least squares, same line LinearRegression fits
+        sxx = self.n * self.sum_xx - self.sum_x * self.sum_x
+        if sxx == 0:
+            return 0.0, self.sum_y / self.n
+        sxy = self.n * self.sum_xy - self.sum_x * self.sum_y
+        slope = sxy / sxx
+        intercept = (self.sum_y - slope * self.sum_x) / self.n
+        return slope, intercept
+
+    def residual_std(self):
+        # Sample standard deviation of the residuals from the trend line
+        if self.n < 2:
+            return math.nan
+        syy = self.n * self.sum_yy - self.sum_y * self.sum_y
+        sxx = self.n * self.sum_xx - self.sum_x * self.sum_x
+        sxy = self.n * self.sum_xy - self.sum_x * self.sum_y
+        sse = syy - (sxy * sxy / sxx if sxx else 0)
+        return math.sqrt(max(sse, 0) / self.n / (self.n - 1))
+
+    def recent_residuals(self, window_size):
+        slope, intercept = self.fit()
+        return [self.daily[x] - (slope * x + intercept) for x in self.days[-window_size:]]
+
+
+class DemandTrendEngine:
+    # Keeps per-item demand trends up to date. The first update starts from
+    # the sales_daily rollup; after that only the sales rows added since the
+    # previous update (tracked by their rowid) are read.
+
+    def __init__(self, window_size=1, num_std=2):
+        self.window_size = window_size
+        self.num_std = num_std
+        self.trends = {}
+        self.high_water_mark = 0
+        self.alerts = {}
+
+    def seed(self, conn):
+        # Start from the daily rollup and the sales high-water mark, read in
+        # one transaction so they agree with each other
+        conn.execute("BEGIN")
+        try:
+            mark = conn.execute("SELECT MAX(rowid) FROM sales").fetchone()[0] or 0
+            rows = conn.execute("SELECT item_name, day, qty FROM sales_daily").fetchall()
+        finally:
+            conn.commit()
+        self.trends = {}
+        self.alerts = {}
+        self.high_water_mark = mark
+        self.add_days(rows)
+        return len(rows)
+
+    def add_days(self, rows):
+        # rows are (item name, day number, quantity)
+        for item_name, day, qty in rows:
+            if day is None or qty is None:
+                continue
+            trend = self.trends.get(item_name)
+            if trend is None:
+                trend = self.trends[item_name] = ItemTrend(day)
+            trend.add(day, qty)
+            self.alerts.pop(item_name, None)
+
+    def update(self, conn):
+        if self.high_water_mark == 0:
+            return self.seed(conn)
+        c = conn.cursor()
+        c.execute(f"SELECT item_name, time_sold / {MICROS_PER_DAY}, SUM(quantity_sold), MAX(rowid) FROM sales "
+                  f"WHERE rowid > ? GROUP BY item_name, time_sold / {MICROS_PER_DAY}", (self.high_water_mark,))
+        rows = c.fetchall()
+        for row in rows:
+            self.high_water_mark = max(self.high_water_mark, row[3])
+        self.add_days(row[:3] for row in rows)
+        return len(rows)
+
+    def is_high_demand(self, trend):
+        # The residual spread is compared against mean + num_std * std of the
+        # residuals over the last window_size days
+        if trend.n < self.window_size:
+            return False
+        residuals = trend.recent_residuals(self.window_size)
+        count = len(residuals)
+        if count < 2:
+            return False
+        mean = sum(residuals) / count
+        std = math.sqrt(sum((r - mean) ** 2 for r in residuals) / (count - 1))
+        return trend.residual_std() > mean + std * self.num_std
+
+    def high_demand_items(self):
+        # Only items touched since the last call are re-evaluated
+        for item_name, trend in self.trends.items():
+            if item_name not in self.alerts:
+                self.alerts[item_name] = self.is_high_demand(trend)
+        return [item_name for item_name, alert in self.alerts.items() if alert]
+
+    def check(self, conn):
+        self.update(conn)
+        return self.high_demand_items()
@@ -0,0 +1,127 @@
+import csv
+import gzip
+
+from .metrics import timed
+from .timeutil import sql_format, to_micros
+
+# Exportable columns of each table with their CSV titles and types, and the
+# column date ranges are filtered on. Item CSVs use the titles the importer
+# reads back.
+EXPORT_TABLES = {
+    'items': {
+        'columns': [('item_id', 'Item ID', 'integer'), ('name', 'Name', 'text'),
+                    ('description', 'Description', 'text'), ('quantity', 'Quantity', 'integer'),
+                    ('price', 'Price', 'real'), ('time', 'Time', 'timestamp'), ('min_qty', 'Min Qty', 'integer')],
+        'time_column': 'time',
+        'order': 'item_id',
+    },
+    'sales': {
+        'columns': [('sale_id', 'Sale ID', 'integer'), ('item_id', 'Item ID', 'integer'),
+                    ('item_name', 'Item Name', 'text'), ('quantity_sold', 'Quantity Sold', 'integer'),
+                    ('time_sold', 'Time Sold', 'timestamp')],
+        'time_column': 'time_sold',
+        'order': 'sale_id',
+    },
+}
+
+EXPORT_FORMATS = ('csv', 'csv.gz', 'parquet')
+
+WRITE_BUFFER = 1 << 20
+
+
+def export_format(path):
+    # Pick the format from the file name
+    path = path.lower()
+    if path.endswith('.gz'):
+        return 'csv.gz'
+    if path.endswith('.parquet'):
+        return 'parquet'
+    return 'csv'
+
+
+def export_query(table, columns=None, start=None, end=None, readable_times=True):
+    spec = EXPORT_TABLES[table]
+    known = {column[0]: column for column in spec['columns']}
+    if columns is None:
+        columns = list(known)
+    unknown = [column for column in columns if column not in known]
+    if unknown:
+        raise ValueError(f"Unknown {table} column(s): {', '.join(unknown)}")
+
+    # Date ranges are half-open: start <= time < end
+    where = []
+    params = []
+    if start is not None:
+        where.append(f"{spec['time_column']} >= ?")
+        params.append(to_micros(start))
+    if end is not None:
+        where.append(f"{spec['time_column']} < ?")
+        params.append(to_micros(end))
+    # Times are formatted as text by SQLite for CSV and left as micros for
+    # Parquet, which stores them natively
+    selected = [sql_format(column) if readable_times and known[column][2] == 'timestamp' else column
+                for column in columns]
+    sql = f"SELECT {', '.join(selected)} FROM {table}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {spec['order']}"
+    return sql, params, [known[column] for column in columns]
+
+
+def write_csv(file, header, chunks):
+    writer = csv.writer(file)
+    writer.writerow(header)
+    rows = 0
+    for chunk in chunks:
+        writer.writerows(chunk)
+        rows += len(chunk)
+    return rows
+
+
+def write_parquet(path, columns, chunks):
+    # Each chunk becomes one row group, so memory stays at one chunk
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {'integer': pa.int64(), 'real': pa.float64(), 'text': pa.string(), 'timestamp': pa.timestamp('us')}
+    schema = pa.schema([(name, types[kind]) for name, _, kind in columns])
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(chunk)
+    return rows
+
+
+@timed('export.table')
+def export_table(repository, table, path, fmt=None, columns=None, start=None, end=None, chunk_size=10000, progress=None):
+    # Stream a table straight from the database to a file and return the
+    # number of rows written. progress(rows) is called after each chunk.
+    fmt = fmt or export_format(path)
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}")
+    sql, params, columns = export_query(table, columns, start, end, readable_times=fmt != 'parquet')
+
+    with repository.connection() as conn:
+        cursor = conn.execute(sql, params)
+
+        def chunks():
+            done = 0
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+                done += len(chunk)
+                if progress is not None:
+                    progress(done)
+
+        header = [title for _, title, _ in columns]
+        if fmt == 'parquet':
+            return write_parquet(path, columns, chunks())
+        if fmt == 'csv.gz':
+            with gzip.open(path, mode='wt', newline='', encoding='utf-8') as file:
+                return write_csv(file, header, chunks())
+        with open(path, mode='w', newline='', encoding='utf-8', buffering=WRITE_BUFFER) as file:
+            return write_csv(file, header, chunks())
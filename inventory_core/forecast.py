@@ -0,0 +1,96 @@
+import math
+from datetime import date
+
+from .timeutil import from_day, to_day
+
+# Demand forecasts for every item at once. Daily sales for the last
+# history_days days are laid out as an items x days matrix (zero on days
+# without sales). Every row shares the same design matrix (trend plus
+# day-of-week terms), so a single least-squares solve fits all items.
+
+
+class DemandForecast:
+    # Per-item results of forecast_demand, as arrays indexed like names
+
+    def __init__(self, names, on_hand, daily_demand, residual_std, days_until_stockout, reorder_qty):
+        self.names = names
+        self.on_hand = on_hand
+        self.daily_demand = daily_demand
+        self.residual_std = residual_std
+        self.days_until_stockout = days_until_stockout
+        self.reorder_qty = reorder_qty
+
+    def rows(self):
+        # (name, on hand, forecast daily demand, days until stockout or None
+        # when not within the horizon, suggested reorder quantity), soonest
+        # stockout first
+        order = sorted(range(len(self.names)), key=lambda i: (math.isnan(self.days_until_stockout[i]),
+                                                              self.days_until_stockout[i], self.names[i]))
+        for i in order:
+            days = self.days_until_stockout[i]
+            yield (self.names[i], int(self.on_hand[i]), round(float(self.daily_demand[i]), 2),
+                   None if math.isnan(days) else int(days), int(self.reorder_qty[i]))
+
+
+def design_matrix(np, offsets, first_weekday, seasonal):
+    # Intercept and trend, plus indicators for six of the seven weekdays
+    columns = [np.ones(len(offsets)), offsets.astype(float)]
+    if seasonal:
+        weekdays = (first_weekday + offsets) % 7
+        columns += [(weekdays == weekday).astype(float) for weekday in range(1, 7)]
+    return np.column_stack(columns)
+
+
+def daily_sales_matrix(np, conn, names, first_day, days):
+    # items x days matrix of quantities sold, from the sales_daily rollup
+    index = {name: i for i, name in enumerate(names)}
+    rows = conn.execute("SELECT item_name, day - ?, qty FROM sales_daily WHERE day BETWEEN ? AND ?",
+                        (first_day, first_day, first_day + days - 1)).fetchall()
+    rows = [(index[name], offset, qty) for name, offset, qty in rows if name in index]
+    sales = np.zeros((len(names), days))
+    if rows:
+        rows = np.array(rows, dtype=np.int64)
+        np.add.at(sales, (rows[:, 0], rows[:, 1]), rows[:, 2])
+    return sales
+
+
+def forecast_demand(conn, quantities, end=None, history_days=56, horizon=14, lead_time=7, service_z=1.65):
+    # quantities is (name, quantity on hand) for each item. Demand is
+    # forecast from the history_days up to and including end (default
+    # today); reorder quantities cover lead_time days of forecast demand plus
+    # service_z standard deviations of safety stock.
+    import numpy as np
+
+    on_hand_by_name = {}
+    for name, quantity in quantities:
+        on_hand_by_name[name] = on_hand_by_name.get(name, 0) + (quantity or 0)
+    names = sorted(on_hand_by_name)
+    on_hand = np.array([on_hand_by_name[name] for name in names], dtype=float)
+
+    first_day = to_day(end or date.today()) - history_days + 1
+    first_weekday = from_day(first_day).weekday()
+    sales = daily_sales_matrix(np, conn, names, first_day, history_days)
+
+    # Seasonality needs at least two of each weekday to be estimated
+    seasonal = history_days >= 14
+    history = design_matrix(np, np.arange(history_days), first_weekday, seasonal)
+    coefficients = np.linalg.lstsq(history, sales.T, rcond=None)[0]
+    residuals = sales - (history @ coefficients).T
+    degrees_of_freedom = max(history_days - history.shape[1], 1)
+    residual_std = np.sqrt((residuals ** 2).sum(axis=1) / degrees_of_freedom)
+
+    days_ahead = max(horizon, lead_time)
+    future = design_matrix(np, np.arange(history_days, history_days + days_ahead), first_weekday, seasonal)
+    demand = np.clip((future @ coefficients).T, 0, None)
+    cumulative = np.cumsum(demand, axis=1)
+
+    # Days until the forecast demand uses up the stock on hand
+    runs_out = cumulative >= on_hand[:, None]
+    days_until_stockout = np.where(runs_out.any(axis=1), runs_out.argmax(axis=1) + 1, np.nan)
+    days_until_stockout[on_hand <= 0] = 0
+
+    safety_stock = service_z * residual_std * math.sqrt(lead_time)
+    reorder_qty = np.ceil(np.clip(cumulative[:, lead_time - 1] + safety_stock - on_hand, 0, None))
+
+    return DemandForecast(names, on_hand, demand[:, :horizon].mean(axis=1), residual_std,
+                          days_until_stockout, reorder_qty)
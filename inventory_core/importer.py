@@ -0,0 +1,220 @@
+import csv
+import os
+import time
+
+from .metrics import timed
+from .timeutil import now_micros, to_micros
+
+# CSV headers understood by the importer; Time and Min Qty are optional
+IMPORT_COLUMNS = {
+    'name': 'name',
+    'description': 'description',
+    'quantity': 'quantity',
+    'price': 'price',
+    'time': 'time',
+    'min qty': 'min_qty',
+}
+
+
+class ImportResult:
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.rejected = []
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def summary(self, max_rejected=10):
+        lines = [f"Imported {self.rows - len(self.rejected)} of {self.rows} rows "
+                 f"({self.inserted} new, {self.updated} updated) in {self.seconds:.1f}s "
+                 f"({self.rows_per_second:,.0f} rows/s)"]
+        if self.rejected:
+            lines.append(f"{len(self.rejected)} rows rejected:")
+            for line, reason in self.rejected[:max_rejected]:
+                lines.append(f"line {line}: {reason}")
+            if len(self.rejected) > max_rejected:
+                lines.append(f"... and {len(self.rejected) - max_rejected} more")
+        return "\n".join(lines)
+
+
+def read_header(reader):
+    # Map each known column to its position in the file
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("The file is empty")
+    positions = {}
+    for position, title in enumerate(header):
+        column = IMPORT_COLUMNS.get(title.strip().lower())
+        if column is not None:
+            positions[column] = position
+    missing = [title for title, column in IMPORT_COLUMNS.items()
+               if column in ('name', 'quantity', 'price') and column not in positions]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    return positions
+
+
+def convert_row(row, positions, default_time):
+    # Returns the values to stage for one CSV row or raises ValueError
+    def field(column):
+        position = positions.get(column)
+        if position is None or position >= len(row):
+            return ''
+        return row[position].strip()
+
+    name = field('name')
+    if not name:
+        raise ValueError("Name is empty")
+    try:
+        quantity = int(field('quantity'))
+    except ValueError:
+        raise ValueError(f"Quantity {field('quantity')!r} is not a whole number")
+    try:
+        price = float(field('price'))
+    except ValueError:
+        raise ValueError(f"Price {field('price')!r} is not a number")
+    time_text = field('time')
+    if time_text:
+        try:
+            micros = to_micros(time_text)
+        except ValueError:
+            raise ValueError(f"Time {time_text!r} is not a valid date and time")
+    else:
+        micros = default_time
+    min_qty = field('min_qty')
+    try:
+        min_qty = int(min_qty) if min_qty else None
+    except ValueError:
+        raise ValueError(f"Min Qty {min_qty!r} is not a whole number")
+    return name, field('description'), quantity, price, micros, min_qty
+
+
+def convert_chunk(rows, positions, default_time):
+    # Convert a whole chunk column by column. Raises ValueError if any row is
+    # bad, in which case the chunk is converted again row by row.
+    width = max(positions.values()) + 1
+    if any(len(row) < width for row in rows):
+        raise ValueError("short row")
+    count = len(rows)
+    names = [row[positions['name']].strip() for row in rows]
+    if not all(names):
+        raise ValueError("empty name")
+    quantities = [int(row[positions['quantity']]) for row in rows]
+    prices = [float(row[positions['price']]) for row in rows]
+    if 'description' in positions:
+        descriptions = [row[positions['description']].strip() for row in rows]
+    else:
+        descriptions = [''] * count
+    if 'time' in positions:
+        times = [to_micros(value) if value else default_time
+                 for value in (row[positions['time']].strip() for row in rows)]
+    else:
+        times = [default_time] * count
+    if 'min_qty' in positions:
+        min_qtys = [int(value) if value else None for value in (row[positions['min_qty']].strip() for row in rows)]
+    else:
+        min_qtys = [None] * count
+    return list(zip(names, descriptions, quantities, prices, times, min_qtys))
+
+
+def counted_lines(file, counter):
+    # Pass lines through to the csv reader while counting what has been read
+    for line in file:
+        counter[0] += len(line)
+        yield line
+
+
+@timed('import.csv')
+def import_csv(repository, path, chunk_size=5000, progress=None):
+    # Stream the CSV in chunks and upsert on item name inside one transaction.
+    # progress(rows, characters_read, file_size) is called after each chunk.
+    result = ImportResult()
+    start = time.perf_counter()
+    file_size = os.path.getsize(path)
+    default_time = now_micros()
+    read = [0]
+
+    with open(path, mode='r', newline='', encoding='utf-8-sig') as file, repository.transaction() as c:
+        reader = csv.reader(counted_lines(file, read))
+        positions = read_header(reader)
+
+        c.execute('''CREATE TEMP TABLE IF NOT EXISTS import_rows
+                     (name text PRIMARY KEY, description text, quantity integer, price real, time integer, min_qty integer)''')
+        c.execute("DELETE FROM temp.import_rows")
+
+        def flush(staged):
+            # Later rows for the same name replace earlier ones
+            c.executemany("INSERT OR REPLACE INTO temp.import_rows VALUES (?, ?, ?, ?, ?, ?)", staged)
+            # Quantity changes are journalled as adjustments before the
+            # update. The IN list makes SQLite look items up by name instead
+            # of scanning the whole table for every chunk.
+            c.execute('''INSERT INTO stock_movements (time, item_id, item_name, kind, delta)
+                         SELECT ?, items.item_id, items.name, 'adjustment',
+                                COALESCE(import_rows.quantity, 0) - COALESCE(items.quantity, 0)
+                         FROM items JOIN temp.import_rows ON items.name = import_rows.name
+                         WHERE items.name IN (SELECT name FROM temp.import_rows)
+                           AND COALESCE(import_rows.quantity, 0) != COALESCE(items.quantity, 0)
+                         ORDER BY items.item_id''', (default_time,))
+            c.execute('''UPDATE items SET description = import_rows.description, quantity = import_rows.quantity,
+                                price = import_rows.price, time = import_rows.time,
+                                min_qty = COALESCE(import_rows.min_qty, items.min_qty)
+                         FROM temp.import_rows
+                         WHERE items.name IN (SELECT name FROM temp.import_rows) AND items.name = import_rows.name
+                           AND (items.description IS NOT import_rows.description
+                                OR items.quantity IS NOT import_rows.quantity
+                                OR items.price IS NOT import_rows.price
+                                OR items.time IS NOT import_rows.time
+                                OR import_rows.min_qty IS NOT NULL AND items.min_qty IS NOT import_rows.min_qty)''')
+            result.updated += c.rowcount
+            last_id = c.execute("SELECT COALESCE(MAX(item_id), 0) FROM items").fetchone()[0]
+            c.execute('''INSERT INTO items (name, description, quantity, price, time, min_qty)
+                         SELECT name, description, quantity, price, time, min_qty FROM temp.import_rows
+                         WHERE NOT EXISTS (SELECT 1 FROM items WHERE items.name = import_rows.name)''')
+            result.inserted += c.rowcount
+            c.execute('''INSERT INTO stock_movements (time, item_id, item_name, kind, delta)
+                         SELECT ?, item_id, name, 'opening', COALESCE(quantity, 0) FROM items WHERE item_id > ?''',
+                      (default_time, last_id))
+            c.execute("DELETE FROM temp.import_rows")
+            if progress is not None:
+                progress(result.rows, read[0], file_size)
+
+        def convert(chunk, lines):
+            try:
+                return convert_chunk(chunk, positions, default_time)
+            except ValueError:
+                pass
+            staged = []
+            for row, line in zip(chunk, lines):
+                try:
+                    staged.append(convert_row(row, positions, default_time))
+                except ValueError as e:
+                    result.rejected.append((line, str(e)))
+            return staged
+
+        chunk = []
+        lines = []
+        for row in reader:
+            if not row:
+                continue
+            chunk.append(row)
+            lines.append(reader.line_num)
+            if len(chunk) == chunk_size:
+                result.rows += len(chunk)
+                flush(convert(chunk, lines))
+                chunk = []
+                lines = []
+        if chunk:
+            result.rows += len(chunk)
+            flush(convert(chunk, lines))
+        c.execute("DROP TABLE temp.import_rows")
+        if result.updated or result.inserted:
+            # Too many items may have changed to patch the item store
+            repository.items_changed(c)
+
+    result.seconds = time.perf_counter() - start
+    return result
@@ -0,0 +1,266 @@
+import math
+import threading
+from array import array
+from bisect import bisect_left
+
+from .metrics import timed
+
+# One in-process copy of the items table shared by the inventory table, the
+# chart and the low-stock check, so none of them query items on their own.
+# Items are kept column by column in typed arrays, ordered by item id: 52
+# bytes an item plus its text, where a row tuple costs a few hundred. Names
+# and descriptions are codes into one table of strings packed end to end as
+# UTF-8, and text repeated across the loaded items is stored once. The
+# repository loads the store on first use and patches it with the rows each
+# transaction wrote once it commits. Sorting and filtering use numpy copies
+# of the columns, imported where needed.
+
+# Item columns in the order the inventory table shows them
+ITEM_COLUMNS = ('name', 'description', 'quantity', 'price', 'time')
+
+ITEM_ROW = "SELECT item_id, name, description, quantity, price, time, min_qty FROM items"
+
+# Stand-ins for NULLs in the typed columns; a NULL quantity is kept as 0 and
+# a NULL price as NaN
+NO_TIME = -1 << 63
+NO_MIN_QTY = -1 << 63
+
+
+class ItemChanges:
+    # Rows written and item ids deleted by one transaction, applied to the
+    # store after it commits. reload drops the store instead, for writes
+    # that touch too many items to patch.
+
+    def __init__(self):
+        self.rows = []
+        self.removed = []
+        self.reload = False
+
+
+class StringTable:
+    # Strings by code, packed as UTF-8 with the offset of each; code 0 is None
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array('q', [0, 0])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, code):
+        if code == 0:
+            return None
+        return self.data[self.offsets[code]:self.offsets[code + 1]].decode()
+
+    def add(self, text):
+        self.data += str(text).encode()
+        self.offsets.append(len(self.data))
+        return len(self.offsets) - 2
+
+
+class ItemColumns:
+
+    def __init__(self):
+        self.strings = StringTable()
+        # Interns text while loading; patches only reuse an item's own text
+        self.codes = {None: 0}
+        self.ids = array('q')
+        self.names = array('i')
+        self.descriptions = array('i')
+        self.quantities = array('q')
+        self.prices = array('d')
+        self.times = array('q')
+        self.min_qtys = array('q')
+        self.ranks = None
+
+    def code(self, text, current=0):
+        # Code for text, reusing current when it holds the same text
+        if text is None:
+            return 0
+        if self.codes is not None:
+            code = self.codes.get(text)
+            if code is None:
+                code = self.codes[text] = self.strings.add(text)
+            return code
+        if current and self.strings[current] == text:
+            return current
+        return self.strings.add(text)
+
+    def position(self, item_id):
+        i = bisect_left(self.ids, item_id)
+        return i if i < len(self.ids) and self.ids[i] == item_id else -1
+
+    def put(self, row):
+        item_id, name, desc, qty, price, time, min_qty = row
+        i = bisect_left(self.ids, item_id)
+        found = i < len(self.ids) and self.ids[i] == item_id
+        values = (self.code(name, self.names[i] if found else 0), self.code(desc, self.descriptions[i] if found else 0),
+                  qty or 0, math.nan if price is None else price,
+                  NO_TIME if time is None else time, NO_MIN_QTY if min_qty is None else min_qty)
+        columns = (self.names, self.descriptions, self.quantities, self.prices, self.times, self.min_qtys)
+        if found:
+            for column, value in zip(columns, values):
+                column[i] = value
+            return
+        self.ids.insert(i, item_id)
+        for column, value in zip(columns, values):
+            column.insert(i, value)
+
+    def remove(self, item_id):
+        i = self.position(item_id)
+        if i >= 0:
+            for column in (self.ids, self.names, self.descriptions, self.quantities, self.prices, self.times,
+                           self.min_qtys):
+                del column[i]
+
+    def row(self, i):
+        price, time = self.prices[i], self.times[i]
+        return (self.strings[self.names[i]], self.strings[self.descriptions[i]], self.quantities[i],
+                None if math.isnan(price) else price, None if time == NO_TIME else time)
+
+    def name_ranks(self):
+        # Rank of every string code in text order, None first. Patched items
+        # can hold the same text under different codes, which rank equal.
+        # Strings are only ever added, so the ranks hold until one is.
+        import numpy as np
+        if self.ranks is not None and len(self.ranks) == len(self.strings):
+            return self.ranks
+        strings = [self.strings[code] for code in range(len(self.strings))]
+        ranks = np.zeros(len(strings), dtype=np.int64)
+        rank = 0
+        previous = None
+        for code in sorted(range(1, len(strings)), key=strings.__getitem__):
+            if strings[code] != previous or rank == 0:
+                rank += 1
+                previous = strings[code]
+            ranks[code] = rank
+        self.ranks = ranks
+        return ranks
+
+    def sort_key(self, column):
+        # Float keys for one of the ITEM_COLUMNS with NULLs lowest, as the
+        # database orders them
+        import numpy as np
+        name = ITEM_COLUMNS[column]
+        if name in ('name', 'description'):
+            codes = np.array(self.names if name == 'name' else self.descriptions)
+            return self.name_ranks()[codes].astype(float)
+        if name == 'quantity':
+            return np.array(self.quantities, dtype=float)
+        if name == 'price':
+            prices = np.array(self.prices)
+            prices[np.isnan(prices)] = -math.inf
+            return prices
+        times = np.array(self.times)
+        return np.where(times == NO_TIME, -math.inf, times.astype(float))
+
+
+class ItemStore:
+    # Thread-safe: the GUI thread patches and reads it while the checker
+    # reads it on its own thread. Methods other than load and apply expect
+    # the store to be loaded; InventoryRepository.items() makes sure it is.
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.columns = ItemColumns()
+        self.loaded = False
+        # Bumped by changes applied while unloaded, so a load that raced
+        # them is read again
+        self.generation = 0
+
+    @timed('items.load')
+    def load(self, conn):
+        while True:
+            with self.lock:
+                if self.loaded:
+                    return
+                generation = self.generation
+            columns = ItemColumns()
+            for row in conn.execute(ITEM_ROW + " ORDER BY item_id"):
+                item_id, name, desc, qty, price, time, min_qty = row
+                columns.ids.append(item_id)
+                columns.names.append(columns.code(name))
+                columns.descriptions.append(columns.code(desc))
+                columns.quantities.append(qty or 0)
+                columns.prices.append(math.nan if price is None else price)
+                columns.times.append(NO_TIME if time is None else time)
+                columns.min_qtys.append(NO_MIN_QTY if min_qty is None else min_qty)
+            columns.codes = None
+            with self.lock:
+                if self.generation == generation:
+                    self.columns = columns
+                    self.loaded = True
+                    return
+
+    def apply(self, changes):
+        # Patch in a committed transaction's changes. Rows are whole items as
+        # committed, so applying them again is harmless. A row the columns
+        # cannot hold drops the store rather than leave it half patched.
+        with self.lock:
+            if changes.reload or not self.loaded:
+                self.invalidate()
+                return
+            try:
+                for item_id in changes.removed:
+                    self.columns.remove(item_id)
+                for row in changes.rows:
+                    self.columns.put(row)
+            except (OverflowError, TypeError, ValueError):
+                self.invalidate()
+
+    def invalidate(self):
+        # Drop the columns; the next reader loads them again
+        with self.lock:
+            self.columns = ItemColumns()
+            self.loaded = False
+            self.generation += 1
+
+    def row(self, item_id):
+        # (name, description, quantity, price, time) or None when the item
+        # is gone
+        with self.lock:
+            i = self.columns.position(item_id)
+            return None if i < 0 else self.columns.row(i)
+
+    def sorted_ids(self, column=None, descending=False):
+        # Ids of every item ordered by one of the ITEM_COLUMNS (by id when
+        # None), ties by id, NULLs first when ascending
+        import numpy as np
+        with self.lock:
+            columns = self.columns
+            if column is None:
+                return array('q', columns.ids)
+            key = columns.sort_key(column)
+            order = np.argsort(-key if descending else key, kind='stable')
+            return array('q', np.array(columns.ids)[order].tobytes())
+
+    def names_and_quantities(self):
+        # The name (empty when NULL) and quantity of every item
+        with self.lock:
+            columns = self.columns
+            return [columns.strings[code] or "" for code in columns.names], array('q', columns.quantities)
+
+    def low_stock(self, min_qty_threshold):
+        # Names of items below their own min_qty or else the threshold, lowest
+        # stock first, like alerts.find_low_stock
+        import numpy as np
+        with self.lock:
+            columns = self.columns
+            quantities = np.array(columns.quantities)
+            min_qtys = np.array(columns.min_qtys)
+            low = np.flatnonzero(quantities < np.where(min_qtys == NO_MIN_QTY, min_qty_threshold, min_qtys))
+            names = [columns.strings[columns.names[i]] for i in low]
+            order = sorted(range(len(low)), key=lambda j: (quantities[low[j]], names[j] is not None, names[j] or ""))
+            return [names[j] for j in order]
+
+    def stats(self):
+        with self.lock:
+            columns = self.columns
+            arrays = (columns.ids, columns.names, columns.descriptions, columns.quantities, columns.prices,
+                      columns.times, columns.min_qtys, columns.strings.offsets)
+            return {
+                'loaded': self.loaded,
+                'items': len(columns.ids),
+                'strings': len(columns.strings) - 1,
+                'bytes': sum(len(column) * column.itemsize for column in arrays) + len(columns.strings.data),
+            }
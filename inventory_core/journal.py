@@ -0,0 +1,102 @@
+from .timeutil import MICROS_PER_DAY, MICROS_PER_SECOND
+
+# Every change to an item's stock is appended to stock_movements as a signed
+# delta, in the same transaction as the change. Snapshots materialize the
+# level of every item as of a movement id, so the stock at any time is the
+# latest snapshot before it plus the movements after the snapshot, instead
+# of a replay of the whole journal. The journal keeps item ids and names
+# without foreign keys so it outlives deleted items.
+
+# opening: an item was created (or the journal started) with its quantity.
+# delete: an item was deleted; its delta takes the level back to zero.
+MOVEMENT_KINDS = ('opening', 'receipt', 'sale', 'waste', 'adjustment', 'delete')
+
+# Writes take their time before waiting for the write lock (at most the
+# connection's busy timeout), so every movement timed before t has been
+# committed by the time a snapshot a minute after t is taken
+SNAPSHOT_MARGIN = 60 * MICROS_PER_SECOND
+
+# Levels from a snapshot (snapshot_id may match nothing) plus the movements
+# in (after_id, upto_id] timed before :before. The name and kind are those of
+# each item's latest row, so an item whose latest movement is a delete is
+# left out, and an item re-created under a reused id starts again.
+LEVELS = '''
+    SELECT item_id, name, quantity FROM (
+        SELECT item_id, name, SUM(quantity) AS quantity, kind, MAX(seq) FROM (
+            SELECT item_id, name, quantity, 0 AS seq, 'opening' AS kind FROM stock_snapshot_levels
+            WHERE snapshot_id = :snapshot_id
+            UNION ALL
+            SELECT item_id, item_name, delta, movement_id, kind FROM stock_movements
+            WHERE movement_id > :after_id AND movement_id <= :upto_id AND time < :before
+        ) GROUP BY item_id
+    ) WHERE kind != 'delete'
+'''
+
+NO_LIMIT = (1 << 63) - 1
+
+
+def record_movement(c, time, item_id, item_name, kind, delta):
+    c.execute("INSERT INTO stock_movements (time, item_id, item_name, kind, delta) VALUES (?, ?, ?, ?, ?)",
+              (time, item_id, item_name, kind, delta))
+
+
+def latest_snapshot(conn, at=NO_LIMIT):
+    # (snapshot_id, last movement id, time) of the latest snapshot taken at
+    # or before the given time, or (None, 0, None). A snapshot only holds
+    # movements timed before it.
+    row = conn.execute("SELECT snapshot_id, last_movement_id, time FROM stock_snapshots WHERE time <= ? "
+                       "ORDER BY time DESC LIMIT 1", (at,)).fetchone()
+    return row or (None, 0, None)
+
+
+def stock_at(conn, time):
+    # (item_id, name, quantity) of every item that existed at the given
+    # micros time, after every movement before it, by name
+    snapshot_id, after_id, _ = latest_snapshot(conn, time)
+    # Movements after a snapshot taken well after time cannot be before it
+    row = conn.execute("SELECT MIN(last_movement_id) FROM stock_snapshots WHERE time >= ?",
+                       (time + SNAPSHOT_MARGIN,)).fetchone()
+    upto_id = NO_LIMIT if row[0] is None else row[0]
+    return conn.execute(LEVELS + " ORDER BY name, item_id", {
+        'snapshot_id': snapshot_id, 'after_id': after_id, 'upto_id': upto_id, 'before': time,
+    }).fetchall()
+
+
+def take_snapshot(conn, time):
+    # Materialize the levels after every movement so far from the previous
+    # snapshot and the movements since. Must run inside a transaction;
+    # returns the new snapshot's id and the number of levels.
+    snapshot_id, after_id, _ = latest_snapshot(conn)
+    upto_id = conn.execute("SELECT COALESCE(MAX(movement_id), 0) FROM stock_movements").fetchone()[0]
+    new_id = conn.execute("INSERT INTO stock_snapshots (time, last_movement_id) VALUES (?, ?)",
+                          (time, upto_id)).lastrowid
+    conn.execute("INSERT INTO stock_snapshot_levels (snapshot_id, item_id, name, quantity) "
+                 "SELECT :new_id, item_id, name, quantity FROM (" + LEVELS + ")", {
+                     'new_id': new_id, 'snapshot_id': snapshot_id, 'after_id': after_id, 'upto_id': upto_id,
+                     'before': NO_LIMIT,
+                 })
+    return new_id, conn.execute("SELECT COUNT(*) FROM stock_snapshot_levels WHERE snapshot_id = ?",
+                                (new_id,)).fetchone()[0]
+
+
+def snapshot_due(conn, time, max_age=MICROS_PER_DAY, max_movements=100000):
+    # A snapshot is due once a day, or sooner after many movements, as long
+    # as something has moved since the last one
+    _, after_id, snapshot_time = latest_snapshot(conn)
+    pending = conn.execute("SELECT COUNT(*) FROM (SELECT 1 FROM stock_movements WHERE movement_id > ? LIMIT ?)",
+                           (after_id, max_movements)).fetchone()[0]
+    if pending == 0:
+        return False
+    return snapshot_time is None or time - snapshot_time >= max_age or pending >= max_movements
+
+
+def prune_snapshots(conn, time, keep_days=31):
+    # Keep every snapshot from the last keep_days days and the first of each
+    # month before that; stock_at falls back to an earlier snapshot plus
+    # more movements. Must run inside a transaction; returns the number
+    # removed.
+    cursor = conn.execute("DELETE FROM stock_snapshots WHERE time < ? AND snapshot_id NOT IN "
+                          "(SELECT MIN(snapshot_id) FROM stock_snapshots "
+                          f" GROUP BY strftime('%Y-%m', time / {MICROS_PER_SECOND}, 'unixepoch'))",
+                          (time - keep_days * MICROS_PER_DAY,))
+    return cursor.rowcount
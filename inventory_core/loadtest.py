@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+# Load-test harness for the HTTP service: keeps a number of keep-alive
+# connections busy with a mix of item lookups, searches and sales for a fixed
+# time and reports sustained requests per second and latency percentiles.
+
+SEARCH_TERMS = ['a', 'b', 'c', 'item', 'to', 'ch']
+
+
+async def request(reader, writer, method, path, payload=None):
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def client(host, port, deadline, write_ratio, item_ids, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            choice = random.random()
+            start = time.perf_counter()
+            if choice < write_ratio:
+                status, _ = await request(reader, writer, 'POST', '/sales',
+                                          {'item_id': random.choice(item_ids), 'quantity': 1})
+            elif choice < write_ratio + (1 - write_ratio) / 2:
+                status, _ = await request(reader, writer, 'GET', f"/items/{random.choice(item_ids)}")
+            else:
+                status, _ = await request(reader, writer, 'GET', f"/items?q={random.choice(SEARCH_TERMS)}&limit=20")
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run_loadtest(host='127.0.0.1', port=8080, connections=32, seconds=10.0, write_ratio=0.2):
+    reader, writer = await asyncio.open_connection(host, port)
+    status, body = await request(reader, writer, 'GET', '/items?limit=1000')
+    writer.close()
+    item_ids = [item['item_id'] for item in json.loads(body)]
+    if status != 200 or not item_ids:
+        raise RuntimeError("The server has no items to test against")
+
+    latencies = []
+    errors = []
+    start = time.perf_counter()
+    deadline = start + seconds
+    await asyncio.gather(*(client(host, port, deadline, write_ratio, item_ids, latencies, errors)
+                           for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='inventory_core.loadtest',
+                                     description="Load test a running 'python -m inventory_core serve'")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--write-ratio', type=float, default=0.2, help="fraction of requests that record a sale")
+    args = parser.parse_args(argv)
+    result = asyncio.run(run_loadtest(args.host, args.port, args.connections, args.seconds, args.write_ratio))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import pathname2url
+
+from .alerts import low_stock_rows
+from .database import sales_report_rows
+from .metrics import timed
+from .schema import schema_version
+from .timeutil import to_micros
+
+# Reports across several restaurant sites, each with its own database. Site
+# databases are opened read-only and queried in parallel on a thread pool:
+# sqlite releases the GIL while a statement runs, so the per-site
+# aggregations run on as many cores as there are workers, and only their
+# small results are merged in Python.
+
+# Sites need integer times and the daily sales rollup
+MIN_SITE_VERSION = 5
+
+
+def open_read_only(path):
+    # A read-only connection; sqlite refuses any write made through it
+    if not os.path.exists(path):
+        raise sqlite3.OperationalError(f"{path} does not exist")
+    conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True, timeout=10,
+                           check_same_thread=False)
+    version = schema_version(conn)
+    if version < MIN_SITE_VERSION:
+        conn.close()
+        raise sqlite3.DatabaseError(f"{path} has schema version {version}; open it with this program once to upgrade it")
+    return conn
+
+
+def run_on_site(path, func, args):
+    conn = open_read_only(path)
+    try:
+        return func(conn, *args)
+    finally:
+        conn.close()
+
+
+class SiteGroup:
+    # sites is a list of (name, database path). Every report returns the
+    # names of the sites it covers, in order, its rows and a dict of the
+    # sites that failed with their error messages, so one unreachable site
+    # does not hide the others.
+
+    def __init__(self, sites, workers=None):
+        self.sites = list(sites)
+        self.workers = workers or max(1, min(len(self.sites), os.cpu_count() or 1))
+
+    def map(self, func, *args):
+        # func(conn, *args) on every site at once; returns the names of the
+        # sites that succeeded, their results in the same order and the errors
+        names = []
+        results = []
+        errors = {}
+        with ThreadPoolExecutor(self.workers) as executor:
+            futures = [executor.submit(run_on_site, path, func, args) for _, path in self.sites]
+            for (name, _), future in zip(self.sites, futures):
+                try:
+                    results.append(future.result())
+                    names.append(name)
+                except sqlite3.Error as e:
+                    errors[name] = str(e)
+        return names, results, errors
+
+    @timed('sites.sales_report')
+    def sales_report(self, start, end):
+        # Rows of (item name, total, then the quantity at each site) for the
+        # half-open range [start, end), by item name
+        start, end = to_micros(start), to_micros(end)
+        names, results, errors = self.map(sales_report_rows, start, end)
+        totals = {}
+        for column, site_rows in enumerate(results):
+            for item, quantity in site_rows:
+                totals.setdefault(item, [0] * len(names))[column] += quantity
+        rows = [(item, sum(quantities), *quantities) for item, quantities in sorted(totals.items())]
+        return names, rows, errors
+
+    @timed('sites.low_stock')
+    def low_stock(self, min_qty_threshold):
+        # Rows of (site, item name, quantity, threshold), lowest stock first
+        names, results, errors = self.map(low_stock_rows, min_qty_threshold)
+        rows = [(name, item, quantity, threshold)
+                for name, site_rows in zip(names, results) for item, quantity, threshold in site_rows]
+        rows.sort(key=lambda row: (row[2], row[1], row[0]))
+        return names, rows, errors
@@ -0,0 +1,105 @@
+import functools
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Lightweight, always-on instrumentation. Spans time named stages (database
+# calls, analysis steps, UI handlers) and keep a count, total and maximum per
+# name; statement counters tally the SQL the repository's connections run.
+# METRICS is shared by the whole process.
+
+
+class SpanStats:
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': self.total * 1000,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'max_ms': self.max * 1000,
+            'last_ms': self.last * 1000,
+        }
+
+
+class Metrics:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans = {}
+        self.statements = Counter()
+        self.started = time.time()
+
+    def record(self, name, seconds):
+        with self.lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = SpanStats()
+            stats.add(seconds)
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def count_statement(self, sql):
+        # sqlite3 trace callback: count statements by their first keyword.
+        # Statements run by triggers and the full-text index come through
+        # prefixed with "--" and are counted together as nested.
+        sql = sql.lstrip()
+        if sql.startswith('--'):
+            kind = 'NESTED'
+        else:
+            kind = sql.split(None, 1)[0].upper() if sql else '?'
+        with self.lock:
+            self.statements[kind] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'uptime_s': time.time() - self.started,
+                'spans': {name: stats.as_dict() for name, stats in sorted(self.spans.items())},
+                'statements': dict(self.statements.most_common()),
+            }
+
+    def reset(self):
+        with self.lock:
+            self.spans = {}
+            self.statements = Counter()
+            self.started = time.time()
+
+    def dump(self, path, **extra):
+        # Write the snapshot, plus any extra sections, as JSON
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({**self.snapshot(), **extra}, file, indent=2)
+
+
+METRICS = Metrics()
+
+
+def timed(name):
+    # Decorator recording every call of a function as a span
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with METRICS.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,69 @@
+from .timeutil import to_day
+
+# Purchase orders move through these states. Draft and sent orders are open:
+# their quantities count as already on order when reorders are generated.
+ORDER_STATUSES = ('draft', 'sent', 'received', 'cancelled')
+OPEN_STATUSES = ('draft', 'sent')
+
+# Reorder levels for every item in one statement. Demand is the average
+# units sold per day over the history from the daily rollup. An item is
+# reordered when its stock plus open orders is below its reorder point: the
+# larger of its minimum quantity and the demand over its supplier's lead time
+# plus safety_days. The order brings it up to the reorder point plus
+# cover_days of demand, rounded up to whole units.
+REORDER_LEVELS = '''
+    WITH demand AS (
+        SELECT item_name, SUM(qty) * 1.0 / :history_days AS daily FROM sales_daily
+        WHERE day >= :first_day AND day <= :last_day GROUP BY item_name
+    ), on_order AS (
+        SELECT lines.item_id, SUM(lines.quantity) AS quantity
+        FROM purchase_order_lines AS lines JOIN purchase_orders AS orders ON orders.order_id = lines.order_id
+        WHERE orders.status IN ('draft', 'sent') GROUP BY lines.item_id
+    ), levels AS (
+        SELECT items.item_id, items.supplier_id, items.price,
+               COALESCE(items.quantity, 0) + COALESCE(on_order.quantity, 0) AS position,
+               COALESCE(demand.daily, 0) AS daily,
+               max(COALESCE(items.min_qty, :min_qty),
+                   COALESCE(demand.daily, 0) * (COALESCE(suppliers.lead_time_days, :lead_time) + :safety_days)) AS reorder_point
+        FROM items
+        LEFT JOIN demand ON demand.item_name = items.name
+        LEFT JOIN on_order ON on_order.item_id = items.item_id
+        LEFT JOIN suppliers ON suppliers.supplier_id = items.supplier_id
+    ), needs AS (
+        SELECT item_id, supplier_id, price, reorder_point + daily * :cover_days - position AS need
+        FROM levels WHERE position < reorder_point
+    )
+    SELECT supplier_id, item_id, CAST(need AS integer) + (need > CAST(need AS integer)), price FROM needs
+'''
+
+
+def generate_reorders(conn, now, min_qty=10, end=None, history_days=28, lead_time=7, safety_days=3, cover_days=14):
+    # Add a draft purchase order line for every item below its reorder point,
+    # grouped by supplier (items without one share a draft with no supplier).
+    # Lines go on the supplier's open draft when there is one. min_qty is
+    # used for items without their own and lead_time for items without a
+    # supplier. Demand is read up to the day of end (default now). Must run
+    # inside a transaction; returns the number of orders and lines added to.
+    last_day = to_day(now if end is None else end)
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS reorder_lines "
+                 "(supplier_id integer, item_id integer, quantity integer, unit_price real)")
+    conn.execute("DELETE FROM temp.reorder_lines")
+    conn.execute("INSERT INTO temp.reorder_lines " + REORDER_LEVELS, {
+        'history_days': history_days, 'first_day': last_day - history_days + 1, 'last_day': last_day,
+        'min_qty': min_qty, 'lead_time': lead_time, 'safety_days': safety_days, 'cover_days': cover_days,
+    })
+
+    # One draft per supplier, reusing the oldest open draft
+    conn.execute("INSERT INTO purchase_orders (supplier_id, status, created) "
+                 "SELECT DISTINCT supplier_id, 'draft', ? FROM temp.reorder_lines AS lines "
+                 "WHERE NOT EXISTS (SELECT 1 FROM purchase_orders AS orders "
+                 "                  WHERE orders.status = 'draft' AND orders.supplier_id IS lines.supplier_id)", (now,))
+    conn.execute("INSERT INTO purchase_order_lines (order_id, item_id, quantity, unit_price) "
+                 "SELECT drafts.order_id, lines.item_id, lines.quantity, lines.unit_price FROM temp.reorder_lines AS lines "
+                 "JOIN (SELECT supplier_id, MIN(order_id) AS order_id FROM purchase_orders WHERE status = 'draft' "
+                 "      GROUP BY supplier_id) AS drafts ON drafts.supplier_id IS lines.supplier_id "
+                 "ORDER BY lines.item_id")
+    orders = conn.execute("SELECT COUNT(*) FROM (SELECT DISTINCT supplier_id FROM temp.reorder_lines)").fetchone()[0]
+    lines = conn.execute("SELECT COUNT(*) FROM temp.reorder_lines").fetchone()[0]
+    conn.execute("DELETE FROM temp.reorder_lines")
+    return orders, lines
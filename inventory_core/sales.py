@@ -0,0 +1,86 @@
+import threading
+import time
+from concurrent.futures import Future
+
+# Write-behind buffer for sales. Terminals hand sales to add() and get a
+# future back; a single writer thread collects them for up to flush_interval
+# seconds (or until max_batch are waiting) and records the whole group in one
+# transaction. Sales that arrive while a batch is committing join the next
+# one, so a rush of sales costs one commit per batch instead of one per sale.
+
+
+class SalesBuffer:
+
+    def __init__(self, repository, flush_interval=0.002, max_batch=500):
+        self.repository = repository
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.pending = []
+        self.condition = threading.Condition()
+        self.closed = False
+
+        # Counters for the load test and diagnostics
+        self.batches = 0
+        self.sales = 0
+
+        self.thread = threading.Thread(target=self.run, name='sales-writer', daemon=True)
+        self.thread.start()
+
+    def add(self, item_id, quantity):
+        # The future resolves to the time of the sale once it is committed,
+        # or raises KeyError for an unknown item
+        future = Future()
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("The sales buffer is closed")
+            self.pending.append((item_id, quantity, future))
+            if len(self.pending) == 1 or len(self.pending) >= self.max_batch:
+                self.condition.notify()
+        return future
+
+    def flush(self):
+        # Wait until everything added so far has been written
+        with self.condition:
+            futures = [future for _, _, future in self.pending]
+            self.condition.notify()
+        for future in futures:
+            future.exception()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                # Give more sales a moment to arrive before writing
+                deadline = time.monotonic() + self.flush_interval
+                while self.pending and len(self.pending) < self.max_batch and not self.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+                if not batch and self.closed:
+                    return
+            self.write(batch)
+
+    def write(self, batch):
+        try:
+            time_sold, unknown = self.repository.record_sales_batch([(item_id, quantity) for item_id, quantity, _ in batch])
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        unknown = set(unknown)
+        for item_id, _, future in batch:
+            if item_id in unknown:
+                future.set_exception(KeyError(item_id))
+            else:
+                future.set_result(time_sold)
+        self.batches += 1
+        self.sales += len(batch)
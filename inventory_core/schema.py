@@ -0,0 +1,196 @@
+import sqlite3
+
+from .timeutil import MICROS_PER_DAY, now_micros, text_to_micros
+
+# The schema version is kept in PRAGMA user_version. Each migration moves the
+# database up by one version inside its own transaction.
+
+
+def create_tables(conn):
+    # Version 1: the original pysql.py layout plus the per-item threshold
+    conn.execute('''CREATE TABLE IF NOT EXISTS items
+                    (name text, description text, quantity integer, price real, time text, min_qty integer)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS sales
+                    (item_name text, quantity_sold integer, time_sold text)''')
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(items)")]
+    if 'min_qty' not in columns:
+        conn.execute("ALTER TABLE items ADD COLUMN min_qty integer")
+
+
+def add_keys_and_indexes(conn):
+    # Version 2: integer primary keys, sales -> items foreign key and indexes.
+    # Row ids are kept so existing rows keep their identity.
+    conn.execute('''CREATE TABLE items_v2
+                    (item_id integer PRIMARY KEY, name text, description text, quantity integer,
+                     price real, time text, min_qty integer)''')
+    conn.execute('''INSERT INTO items_v2 (item_id, name, description, quantity, price, time, min_qty)
+                    SELECT rowid, name, description, quantity, price, time, min_qty FROM items''')
+    conn.execute("DROP TABLE items")
+    conn.execute("ALTER TABLE items_v2 RENAME TO items")
+
+    conn.execute('''CREATE TABLE sales_v2
+                    (sale_id integer PRIMARY KEY,
+                     item_id integer REFERENCES items (item_id) ON DELETE SET NULL,
+                     item_name text, quantity_sold integer, time_sold text)''')
+    conn.execute('''INSERT INTO sales_v2 (sale_id, item_id, item_name, quantity_sold, time_sold)
+                    SELECT rowid, (SELECT MIN(item_id) FROM items WHERE items.name = sales.item_name),
+                           item_name, quantity_sold, time_sold
+                    FROM sales''')
+    conn.execute("DROP TABLE sales")
+    conn.execute("ALTER TABLE sales_v2 RENAME TO sales")
+
+    conn.execute("CREATE INDEX items_name ON items (name)")
+    conn.execute("CREATE INDEX sales_time_sold ON sales (time_sold)")
+    conn.execute("CREATE INDEX sales_item_time_sold ON sales (item_id, time_sold)")
+
+
+def add_search_index(conn):
+    # Version 3: full-text index over item names and descriptions, kept in
+    # sync with items by triggers. The prefix indexes speed up prefix search.
+    conn.execute('''CREATE VIRTUAL TABLE items_fts USING fts5
+                    (name, description, content='items', content_rowid='item_id', prefix='1 2 3')''')
+    conn.execute("INSERT INTO items_fts (items_fts) VALUES ('rebuild')")
+    conn.execute('''CREATE TRIGGER items_fts_insert AFTER INSERT ON items BEGIN
+                        INSERT INTO items_fts (rowid, name, description) VALUES (new.item_id, new.name, new.description);
+                    END''')
+    conn.execute('''CREATE TRIGGER items_fts_delete AFTER DELETE ON items BEGIN
+                        INSERT INTO items_fts (items_fts, rowid, name, description)
+                        VALUES ('delete', old.item_id, old.name, old.description);
+                    END''')
+    conn.execute('''CREATE TRIGGER items_fts_update AFTER UPDATE OF name, description ON items BEGIN
+                        INSERT INTO items_fts (items_fts, rowid, name, description)
+                        VALUES ('delete', old.item_id, old.name, old.description);
+                        INSERT INTO items_fts (rowid, name, description) VALUES (new.item_id, new.name, new.description);
+                    END''')
+
+
+def backfill_sales_daily(conn):
+    # Rebuild the daily rollup from the raw sales rows; returns the row count
+    conn.execute("DELETE FROM sales_daily")
+    conn.execute(f'''INSERT INTO sales_daily (day, item_name, qty)
+                     SELECT time_sold / {MICROS_PER_DAY}, item_name, SUM(quantity_sold) FROM sales
+                     WHERE time_sold IS NOT NULL AND item_name IS NOT NULL
+                     GROUP BY time_sold / {MICROS_PER_DAY}, item_name''')
+    return conn.execute("SELECT COUNT(*) FROM sales_daily").fetchone()[0]
+
+
+def add_sales_daily(conn):
+    # Version 4: quantity sold per item per day, maintained with every sale
+    conn.execute('''CREATE TABLE sales_daily
+                    (day text, item_name text, qty integer, PRIMARY KEY (day, item_name)) WITHOUT ROWID''')
+    conn.execute('''INSERT INTO sales_daily (day, item_name, qty)
+                    SELECT date(time_sold), item_name, SUM(quantity_sold) FROM sales
+                    WHERE date(time_sold) IS NOT NULL AND item_name IS NOT NULL
+                    GROUP BY date(time_sold), item_name''')
+
+
+def convert_time_column(conn, table, column):
+    # Replace a text time column with an integer micros column of the same
+    # name. Adding, dropping and renaming columns keeps the table itself, so
+    # foreign keys and triggers on it are left alone.
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column}_micros integer")
+    conn.execute(f"UPDATE {table} SET {column}_micros = text_to_micros({column})")
+    conn.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+    conn.execute(f"ALTER TABLE {table} RENAME COLUMN {column}_micros TO {column}")
+
+
+def add_integer_times(conn):
+    # Version 5: times as integer microseconds since the epoch (see
+    # timeutil) and days in the rollup as integer day numbers
+    conn.create_function('text_to_micros', 1, text_to_micros, deterministic=True)
+    conn.execute("DROP INDEX sales_time_sold")
+    conn.execute("DROP INDEX sales_item_time_sold")
+    convert_time_column(conn, 'items', 'time')
+    convert_time_column(conn, 'sales', 'time_sold')
+    conn.execute("CREATE INDEX sales_time_sold ON sales (time_sold)")
+    conn.execute("CREATE INDEX sales_item_time_sold ON sales (item_id, time_sold)")
+
+    conn.execute("DROP TABLE sales_daily")
+    conn.execute('''CREATE TABLE sales_daily
+                    (day integer, item_name text, qty integer, PRIMARY KEY (day, item_name)) WITHOUT ROWID''')
+    backfill_sales_daily(conn)
+
+
+def add_sales_time_covering_index(conn):
+    # Version 6: report range scans read item names and quantities straight
+    # from the time index. It replaces the plain time_sold index.
+    conn.execute("CREATE INDEX sales_time_item_qty ON sales (time_sold, item_name, quantity_sold)")
+    conn.execute("DROP INDEX sales_time_sold")
+
+
+def add_purchasing(conn):
+    # Version 7: suppliers, each item's supplier and purchase orders. Orders
+    # go draft -> sent -> received, or are cancelled; times are micros.
+    conn.execute('''CREATE TABLE suppliers
+                    (supplier_id integer PRIMARY KEY, name text NOT NULL, contact text,
+                     lead_time_days integer NOT NULL DEFAULT 7)''')
+    conn.execute("ALTER TABLE items ADD COLUMN supplier_id integer REFERENCES suppliers (supplier_id) ON DELETE SET NULL")
+    conn.execute("CREATE INDEX items_supplier ON items (supplier_id)")
+
+    conn.execute('''CREATE TABLE purchase_orders
+                    (order_id integer PRIMARY KEY,
+                     supplier_id integer REFERENCES suppliers (supplier_id) ON DELETE SET NULL,
+                     status text NOT NULL DEFAULT 'draft', created integer NOT NULL, received integer)''')
+    conn.execute("CREATE INDEX purchase_orders_status ON purchase_orders (status, supplier_id)")
+    conn.execute('''CREATE TABLE purchase_order_lines
+                    (line_id integer PRIMARY KEY,
+                     order_id integer NOT NULL REFERENCES purchase_orders (order_id) ON DELETE CASCADE,
+                     item_id integer REFERENCES items (item_id) ON DELETE SET NULL,
+                     quantity integer NOT NULL, unit_price real)''')
+    conn.execute("CREATE INDEX purchase_order_lines_order ON purchase_order_lines (order_id)")
+    conn.execute("CREATE INDEX purchase_order_lines_item ON purchase_order_lines (item_id)")
+
+
+def add_stock_journal(conn):
+    # Version 8: the stock movement journal and its snapshots (see
+    # journal.py). Every existing item gets an opening movement for its
+    # current quantity, so history starts at the upgrade.
+    conn.execute('''CREATE TABLE stock_movements
+                    (movement_id integer PRIMARY KEY, time integer NOT NULL, item_id integer NOT NULL,
+                     item_name text, kind text NOT NULL, delta integer NOT NULL)''')
+    conn.execute("CREATE INDEX stock_movements_item ON stock_movements (item_id, movement_id)")
+    conn.execute('''CREATE TABLE stock_snapshots
+                    (snapshot_id integer PRIMARY KEY, time integer NOT NULL, last_movement_id integer NOT NULL)''')
+    conn.execute("CREATE INDEX stock_snapshots_time ON stock_snapshots (time)")
+    conn.execute('''CREATE TABLE stock_snapshot_levels
+                    (snapshot_id integer NOT NULL REFERENCES stock_snapshots (snapshot_id) ON DELETE CASCADE,
+                     item_id integer NOT NULL, name text, quantity integer NOT NULL,
+                     PRIMARY KEY (snapshot_id, item_id)) WITHOUT ROWID''')
+    conn.execute('''INSERT INTO stock_movements (time, item_id, item_name, kind, delta)
+                    SELECT ?, item_id, name, 'opening', COALESCE(quantity, 0) FROM items ORDER BY item_id''',
+                 (now_micros(),))
+
+
+MIGRATIONS = [
+    create_tables,
+    add_keys_and_indexes,
+    add_search_index,
+    add_sales_daily,
+    add_integer_times,
+    add_sales_time_covering_index,
+    add_purchasing,
+    add_stock_journal,
+]
+
+LATEST_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    # Bring the database up to LATEST_VERSION and return the version it had
+    version = schema_version(conn)
+    if version > LATEST_VERSION:
+        raise sqlite3.DatabaseError(f"Database schema version {version} is newer than this program ({LATEST_VERSION})")
+    for target in range(version + 1, LATEST_VERSION + 1):
+        conn.execute("BEGIN")
+        try:
+            MIGRATIONS[target - 1](conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return version
@@ -0,0 +1,222 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from .sales import SalesBuffer
+from .timeutil import format_micros, to_micros
+
+# A small HTTP/1.1 JSON service over the inventory for POS terminals and
+# kitchen tablets. Reads run concurrently on a thread pool; sales go through
+# the SalesBuffer's single writer thread, which commits them in batches, so
+# writers never contend for the SQLite write lock.
+
+STATUS_TEXT = {
+    200: 'OK',
+    201: 'Created',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+}
+
+MAX_BODY = 1 << 20
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def item_json(row):
+    item_id, name, description, quantity, price, time = row
+    return {'item_id': item_id, 'name': name, 'description': description,
+            'quantity': quantity, 'price': price, 'time': format_micros(time, 'microseconds')}
+
+
+def int_param(query, name, default=None):
+    values = query.get(name)
+    if not values:
+        if default is None:
+            raise HTTPError(400, f"Missing parameter {name!r}")
+        return default
+    try:
+        return int(values[0])
+    except ValueError:
+        raise HTTPError(400, f"Parameter {name!r} must be a whole number")
+
+
+def str_param(query, name):
+    values = query.get(name)
+    if not values:
+        raise HTTPError(400, f"Missing parameter {name!r}")
+    return values[0]
+
+
+class InventoryServer:
+
+    def __init__(self, repository, host='127.0.0.1', port=8080, readers=4):
+        self.repository = repository
+        self.host = host
+        self.port = port
+        self.readers = ThreadPoolExecutor(readers, thread_name_prefix='inventory-read')
+        self.sales = SalesBuffer(repository)
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.readers.shutdown()
+        self.sales.close()
+
+    # Reads and writes
+
+    async def read(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.readers, func, *args)
+
+    async def record_sale(self, item_id, quantity):
+        # Resolves once the writer thread has committed the sale's batch
+        return await asyncio.wrap_future(self.sales.add(item_id, quantity))
+
+    # HTTP
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self.respond(writer, 400, {'error': "Malformed request line"}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self.respond(writer, 400, {'error': "Invalid Content-Length"}, keep_alive=False)
+                    break
+                if length > MAX_BODY:
+                    await self.respond(writer, 413, {'error': "Request body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+
+                try:
+                    status, payload = await self.route(method, target, body)
+                except HTTPError as e:
+                    status, payload = e.status, {'error': e.message}
+                except KeyError as e:
+                    status, payload = 404, {'error': f"Unknown item {e.args[0]}"}
+                except Exception as e:
+                    status, payload = 500, {'error': str(e)}
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, keep_alive=True):
+        body = json.dumps(payload).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def route(self, method, target, body):
+        url = urlsplit(target)
+        parts = [part for part in url.path.split('/') if part]
+        query = parse_qs(url.query)
+
+        if parts == ['items']:
+            if method != 'GET':
+                raise HTTPError(405, "Use GET")
+            return 200, await self.read(self.list_items, query)
+        if len(parts) == 2 and parts[0] == 'items':
+            if method != 'GET':
+                raise HTTPError(405, "Use GET")
+            try:
+                item_id = int(parts[1])
+            except ValueError:
+                raise HTTPError(404, "Not found")
+            rows = await self.read(self.repository.get_items, [item_id])
+            if not rows:
+                raise KeyError(item_id)
+            return 200, item_json(rows[0])
+        if parts == ['sales']:
+            if method != 'POST':
+                raise HTTPError(405, "Use POST")
+            item_id, quantity = self.parse_sale(body)
+            time_sold = await self.record_sale(item_id, quantity)
+            return 201, {'item_id': item_id, 'quantity': quantity, 'time': format_micros(time_sold, 'microseconds')}
+        if parts == ['reports', 'sales']:
+            if method != 'GET':
+                raise HTTPError(405, "Use GET")
+            # Half-open range: start <= time_sold < end
+            try:
+                start, end = to_micros(str_param(query, 'start')), to_micros(str_param(query, 'end'))
+            except ValueError:
+                raise HTTPError(400, "start and end must be ISO 8601 dates or times")
+            rows = await self.read(self.repository.sales_report, start, end)
+            return 200, [{'item_name': name, 'quantity': quantity} for name, quantity in rows]
+        raise HTTPError(404, "Not found")
+
+    def list_items(self, query):
+        # GET /items?q=terms&after=item_id&limit=n
+        limit = min(int_param(query, 'limit', 100), 1000)
+        after = int_param(query, 'after', 0)
+        text = query.get('q', [''])[0]
+        if text.strip():
+            item_ids = sorted(item_id for item_id in self.repository.search_item_ids(text) if item_id > after)
+            rows = self.repository.get_items(item_ids[:limit])
+        else:
+            rows = self.repository.items_page(after, limit)
+        return [item_json(row) for row in rows]
+
+    def parse_sale(self, body):
+        try:
+            sale = json.loads(body or b'{}')
+            item_id = int(sale['item_id'])
+            quantity = int(sale['quantity'])
+        except (ValueError, KeyError, TypeError):
+            raise HTTPError(400, "Expected a JSON body like {\"item_id\": 1, \"quantity\": 2}")
+        if quantity <= 0:
+            raise HTTPError(400, "quantity must be positive")
+        return item_id, quantity
+
+
+def serve(repository, host='127.0.0.1', port=8080, readers=4):
+    server = InventoryServer(repository, host, port, readers)
+    print(f"Serving {repository.path} on http://{host}:{port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.sales.close()
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+# Timestamps are stored as integer microseconds since 1970-01-01. The app
+# works in naive local time, which is stored as if it were UTC, so the day of
+# a timestamp is simply micros // MICROS_PER_DAY and sorting, range filters
+# and daily bucketing are plain integer operations in SQL and numpy. Every
+# conversion to and from datetimes and text goes through this module.
+
+MICROS_PER_SECOND = 1000000
+MICROS_PER_DAY = 86400 * MICROS_PER_SECOND
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_DATE = EPOCH.date()
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_micros(value):
+    # A datetime, date, ISO 8601 string or micros value as micros; None
+    # stays None. Raises ValueError for text that is not a date and time.
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.strip())
+    elif not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return (value - EPOCH) // ONE_MICROSECOND
+
+
+def from_micros(micros):
+    if micros is None:
+        return None
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def now_micros():
+    return to_micros(datetime.now())
+
+
+def format_micros(micros, timespec='seconds'):
+    # Text for display; '' for a missing time
+    if micros is None:
+        return ''
+    return from_micros(micros).isoformat(' ', timespec)
+
+
+def to_day(value):
+    # The day number (days since 1970-01-01) of a time or date
+    return to_micros(value) // MICROS_PER_DAY
+
+
+def from_day(day):
+    return EPOCH_DATE + timedelta(days=day)
+
+
+def sql_format(column):
+    # SQL expression giving a micros column as 'YYYY-MM-DD HH:MM:SS.ffffff'
+    # text, for exports that should stay readable without a per-row Python
+    # conversion
+    return (f"strftime('%Y-%m-%d %H:%M:%S', {column} / {MICROS_PER_SECOND}, 'unixepoch') "
+            f"|| '.' || printf('%06d', {column} % {MICROS_PER_SECOND})")
+
+
+def text_to_micros(text):
+    # For converting stored text in SQL; unreadable values become NULL
+    try:
+        return to_micros(text)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,127 @@
+import math
+from array import array
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from inventory_core.timeutil import format_micros
+
+ITEM_HEADERS = ["Item Name", "Description", "Quantity", "Price", "Modified"]
+
+
+class ItemTableModel(QAbstractTableModel):
+    # Inventory table over the repository's item store. The model only keeps
+    # the ids of the rows it shows, in order; cells are read from the store,
+    # which the repository patches on every write. A search narrows the ids
+    # to the matches from the full-text index.
+
+    def __init__(self, repository, parent=None):
+        super().__init__(parent)
+        self.repository = repository
+        self.sort_column = None
+        self.sort_order = Qt.AscendingOrder
+        self.sorted_ids = array('q')
+        self.filter_ids = None
+        self.ids = array('q')
+
+    def reload(self):
+        store = self.repository.items()
+        self.sorted_ids = store.sorted_ids(self.sort_column, self.sort_order == Qt.DescendingOrder)
+        self.apply_filter()
+
+    def set_filter(self, item_ids):
+        # Show only the given item ids, or every item when item_ids is None
+        self.filter_ids = item_ids
+        self.apply_filter()
+
+    def apply_filter(self):
+        self.beginResetModel()
+        if self.filter_ids is None:
+            self.ids = array('q', self.sorted_ids)
+        else:
+            import numpy as np
+            sorted_ids = np.array(self.sorted_ids)
+            matches = np.fromiter(self.filter_ids, dtype=np.int64, count=len(self.filter_ids))
+            self.ids = array('q', sorted_ids[np.isin(sorted_ids, matches)].tobytes())
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.ids)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(ITEM_HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        if role == Qt.UserRole:
+            return self.ids[row]
+        if role != Qt.DisplayRole:
+            return None
+        values = self.repository.items().row(self.ids[row])
+        if values is None:
+            # Deleted by another process; gone after the next reload
+            return None
+        if column == 2:
+            return str(values[2])
+        if column == 3:
+            return "" if values[3] is None else str(values[3])
+        if column == 4:
+            # Show the time without microseconds
+            return None if values[4] is None else format_micros(values[4])
+        return values[column]
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return ITEM_HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sort_column = column
+        self.sort_order = order
+        self.reload()
+
+    def item_id(self, row):
+        return self.ids[row]
+
+    def row_values(self, row):
+        # (name, description, quantity, price) with NaN for no price, or None
+        # when the item is gone
+        values = self.repository.items().row(self.ids[row])
+        if values is None:
+            return None
+        name, desc, qty, price, _ = values
+        return name, desc, qty, math.nan if price is None else price
+
+    def row_of(self, item_id):
+        try:
+            return self.ids.index(item_id)
+        except ValueError:
+            return -1
+
+    def add_row(self, item_id):
+        # New items are shown after the other rows until the next reload
+        row = len(self.ids)
+        self.sorted_ids.append(item_id)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.ids.append(item_id)
+        self.endInsertRows()
+
+    def update_row(self, item_id):
+        row = self.row_of(item_id)
+        if row >= 0:
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(ITEM_HEADERS) - 1))
+
+    def remove_row(self, item_id):
+        if item_id in self.sorted_ids:
+            self.sorted_ids.remove(item_id)
+        row = self.row_of(item_id)
+        if row < 0:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.ids[row]
+        self.endRemoveRows()
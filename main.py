@@ -1,17 +1,25 @@
+import time
+# Taken before the other imports so the startup time includes them
+started = time.perf_counter()
+
 import sys
-import pandas as pd
-from PyQt5.QtWidgets import QDialogButtonBox, QListWidget, QPushButton, QTabWidget, QSystemTrayIcon, QDialog, QApplication, QSpinBox, QMenuBar, QMenu, QAction, QMessageBox, QFileDialog, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QTableWidget, QTableWidgetItem
+from PyQt5.QtWidgets import QDialogButtonBox, QListWidget, QPushButton, QTabWidget, QSystemTrayIcon, QDialog, QApplication, QSpinBox, QMenuBar, QMenu, QAction, QMessageBox, QFileDialog, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QComboBox, QPushButton, QTableView, QTableWidget, QTableWidgetItem, QProgressDialog, QCalendarWidget
 from PyQt5.QtGui import QFont, QIcon, QIntValidator, QDoubleValidator
 from PyQt5.QtCore import Qt, QTimer, QSettings
-import sqlite3
-import csv
-from datetime import datetime
-import numpy as np
+from stock_used import StockUsedDialog
+from worker import InventoryChecker, ImportThread, ExportThread
+from item_model import ItemTableModel
+from inventory_core import InventoryRepository, SiteGroup, alert_message, export_format
+from inventory_core.metrics import METRICS
+from inventory_core.timeutil import MICROS_PER_DAY, format_micros, to_micros
+from diagnostics import DiagnosticsTab, EventLoopMonitor, Profiler
+from orders import OrdersTab, SuppliersTab
+from sites import SitesDialog
+
+# Startup is timed from the first import to the first pass of the event loop
+STARTUP_BUDGET = 1.5
 
-import matplotlib.pyplot as plt
 
-from sklearn.linear_model import LinearRegression
-from stock_used import StockUsedDialog
 class InventoryManagementSystem(QWidget):
 
     def __init__(self):
@@ -26,6 +34,22 @@ class InventoryManagementSystem(QWidget):
         self.tray_icon.setIcon(QIcon("icon.png"))
         self.tray_icon.show()
 
+        # Load settings
+        self.load_settings()
+
+        # All database access goes through the repository
+        self.repository = InventoryRepository(self.database_path)
+
+        # Inventory checks run on a background thread with their own
+        # connection. Demand alerts keep their one-day window; the window_size
+        # setting drives the forecast.
+        self.checker = InventoryChecker(self.repository, parent=self)
+        self.checker.high_demand.connect(self.notify_high_demand)
+        self.checker.low_stock.connect(self.notify_low_stock)
+        self.checker.items_changed.connect(self.populate_item_list)
+        self.last_check_error = None
+        self.checker.failed.connect(self.notify_check_failed)
+
         # Check item quantities every minute
         self.check_quantities_timer = QTimer(self)
         self.check_quantities_timer.timeout.connect(self.check_quantities)
@@ -34,8 +58,14 @@ class InventoryManagementSystem(QWidget):
         # Sorting
         self.sort_order = Qt.AscendingOrder
 
-        # Load settings
-        self.load_settings()
+        # Chart window, created when first opened
+        self.chart_window = None
+
+        # Record how long the event loop is blocked; profiling is opt-in from
+        # the Settings menu
+        self.event_loop_monitor = EventLoopMonitor(parent=self)
+        self.event_loop_monitor.start()
+        self.profiler = Profiler()
 
         self.setup_ui()
         
@@ -47,23 +77,32 @@ class InventoryManagementSystem(QWidget):
         self.tabs.setGeometry(100, 100, 700, 400)
 
         # Create tabs
-        self.orders_tab = QWidget()
+        self.orders_tab = OrdersTab(self.repository, lambda: self.min_qty_threshold)
         self.inventory_tab = QWidget()
-        self.suppliers_tab = QWidget()
+        self.suppliers_tab = SuppliersTab(self.repository)
         self.reports_tab = QWidget()
+        self.diagnostics_tab = DiagnosticsTab(self.diagnostics_sections)
 
         # Add tabs to the tab widget
         self.tabs.addTab(self.inventory_tab, "Inventory")
         self.tabs.addTab(self.orders_tab, "Orders")
         self.tabs.addTab(self.suppliers_tab, "Suppliers")
         self.tabs.addTab(self.reports_tab, "Reports")
+        self.tabs.addTab(self.diagnostics_tab, "Diagnostics")
         self.tabs.tabBar().setFont(self.font)
 
+        # Receiving an order changes stock, so the item list is reloaded
+        self.orders_tab.stock_received.connect(self.populate_item_list)
+
         ## TABS: REPORT
         self.reports_layout = QVBoxLayout()
         
         self.reports_list = QListWidget()
         self.reports_list.addItem("Stock Used Report")
+        self.reports_list.addItem("Forecast Report")
+        self.reports_list.addItem("Stock On Date Report")
+        self.reports_list.addItem("Consolidated Stock Used Report")
+        self.reports_list.addItem("Consolidated Low Stock Report")
         self.reports_list.setFont(self.font)
         self.generate_report_button = QPushButton("Generate Report")
         self.generate_report_button.setFont(self.font)
@@ -90,6 +129,12 @@ class InventoryManagementSystem(QWidget):
         self.delete_item_button.setIcon(delete_icon)
         self.delete_item_button.setFont(self.font)
 
+        self.record_sale_button = QPushButton("Record Sale")
+        self.record_sale_button.setFont(self.font)
+
+        self.history_button = QPushButton("History")
+        self.history_button.setFont(self.font)
+
         self.search_bar = QLineEdit()
         self.search_bar.setPlaceholderText("Search...")
         self.search_bar.setFont(self.font)
@@ -98,6 +143,8 @@ class InventoryManagementSystem(QWidget):
         self.nav_bar.addWidget(self.add_item_button)
         self.nav_bar.addWidget(self.edit_item_button)
         self.nav_bar.addWidget(self.delete_item_button)
+        self.nav_bar.addWidget(self.record_sale_button)
+        self.nav_bar.addWidget(self.history_button)
         self.nav_bar.addStretch()
         self.nav_bar.addWidget(self.search_bar)
 
@@ -107,13 +154,13 @@ class InventoryManagementSystem(QWidget):
         self.setLayout(main_layout)
 
         # Set up the inventory tab
-        self.item_list = QTableWidget()
-        self.item_list.setColumnCount(5)
-        self.item_list.setHorizontalHeaderLabels(["Item Name", "Description", "Quantity", "Price", "Modified"])
+        self.item_model = ItemTableModel(self.repository, parent=self)
+        self.item_list = QTableView()
+        self.item_list.setModel(self.item_model)
         self.item_list.setColumnWidth(4, 200)  # Set the width of the "Modified" column to 200 pixels
 
-        self.item_list.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.item_list.setSelectionBehavior(QTableWidget.SelectRows)
+        self.item_list.setEditTriggers(QTableView.NoEditTriggers)
+        self.item_list.setSelectionBehavior(QTableView.SelectRows)
         self.item_list.setFont(self.font)
 
         # Add the item list to the inventory tab
@@ -131,8 +178,16 @@ class InventoryManagementSystem(QWidget):
         self.edit_item_button.clicked.connect(self.edit_item)
         # Delete item button functionality
         self.delete_item_button.clicked.connect(self.delete_item)
-        # Search bar functionality
-        self.search_bar.textChanged.connect(self.search_items)
+        # Record sale button functionality
+        self.record_sale_button.clicked.connect(self.record_sale)
+        # History button functionality
+        self.history_button.clicked.connect(self.show_item_history)
+        # Search bar functionality; the search runs once typing pauses
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.search_items)
+        self.search_bar.textChanged.connect(lambda: self.search_timer.start())
 
         # Create a menu bar
         menu_bar = QMenuBar()
@@ -142,10 +197,15 @@ class InventoryManagementSystem(QWidget):
         menu_bar.addMenu(file_menu)
 
         # Add an export action to the file menu
-        export_action = QAction("Export to CSV", self)
+        export_action = QAction("Export Items", self)
         export_action.triggered.connect(self.export_items)
         file_menu.addAction(export_action)
 
+        # Add a sales export action to the file menu
+        export_sales_action = QAction("Export Sales", self)
+        export_sales_action.triggered.connect(self.export_sales)
+        file_menu.addAction(export_sales_action)
+
         # Add an import action to the file menu
         import_action = QAction("Import", self)
         import_action.triggered.connect(self.import_items)
@@ -160,6 +220,19 @@ class InventoryManagementSystem(QWidget):
         min_qty_action.triggered.connect(self.set_min_qty_threshold)
         settings_menu.addAction(min_qty_action)
 
+        # Add a locations action to the settings menu
+        locations_action = QAction("Locations", self)
+        locations_action.triggered.connect(self.set_locations)
+        settings_menu.addAction(locations_action)
+
+        # Add profiling toggles to the settings menu
+        profile_action = QAction("Profile CPU", self, checkable=True)
+        profile_action.toggled.connect(self.toggle_cpu_profile)
+        settings_menu.addAction(profile_action)
+        memory_action = QAction("Trace Memory Allocations", self, checkable=True)
+        memory_action.toggled.connect(self.toggle_memory_trace)
+        settings_menu.addAction(memory_action)
+
         # Add a help menu to the menu bar
         help_menu = QMenu("Help", self)
         menu_bar.addMenu(help_menu)
@@ -169,6 +242,11 @@ class InventoryManagementSystem(QWidget):
         about_action.triggered.connect(self.about)
         help_menu.addAction(about_action)
 
+        # Add a cache statistics action to the help menu
+        cache_action = QAction("Cache Statistics", self)
+        cache_action.triggered.connect(self.show_cache_stats)
+        help_menu.addAction(cache_action)
+
         # Add a close action to the file menu
         close_action = QAction("Close", self)
         close_action.triggered.connect(self.close)
@@ -187,107 +265,83 @@ class InventoryManagementSystem(QWidget):
 
     def generate_report(self):
         current_item = self.reports_list.currentItem()
+        if current_item is None:
+            return
         if current_item.text() == "Stock Used Report":
             self.generate_sales_report()
+        elif current_item.text() == "Forecast Report":
+            self.generate_forecast_report()
+        elif current_item.text() == "Stock On Date Report":
+            self.generate_stock_on_date_report()
+        elif current_item.text() == "Consolidated Stock Used Report":
+            self.generate_consolidated_sales_report()
+        elif current_item.text() == "Consolidated Low Stock Report":
+            self.generate_consolidated_low_stock_report()
             
     def sort_table(self, column):
-        self.item_list.sortItems(column, self.sort_order)
+        self.item_model.sort(column, self.sort_order)
         if self.sort_order == Qt.AscendingOrder:
             self.sort_order = Qt.DescendingOrder
         else:
             self.sort_order = Qt.AscendingOrder
 
     def populate_item_list(self):
-        # Connect to the database and retrieve the item data
-        conn = sqlite3.connect('inventory.db')
-        c = conn.cursor()
-        c.execute("SELECT * FROM items")
-        items = c.fetchall()
-        conn.close()
-
-        # Populate the item list with the data
-        self.item_list.setRowCount(len(items))
-        for row, item in enumerate(items):
-            for column, value in enumerate(item):
-                if column == 4:  # Check if the column is the 'Modified' column
-                    # Format the time string without milliseconds
-                    value = datetime.strptime(value, '%Y-%m-%d %H:%M:%S.%f').strftime('%Y-%m-%d %H:%M:%S')
-                self.item_list.setItem(row, column, QTableWidgetItem(str(value)))
-
+        # The model sorts the ids from the item store; rows are read from the
+        # store as the view paints them
+        with METRICS.span('ui.populate_item_list'):
+            self.item_model.reload()
+
+    def selected_row(self):
+        rows = self.item_list.selectionModel().selectedRows()
+        if len(rows) == 0:
+            return None
+        return rows[0].row()
+
+    def selected_item(self):
+        # (item id, (name, description, quantity, price)) of the selected
+        # row, or None. An item deleted elsewhere refreshes the list instead.
+        selected_row = self.selected_row()
+        if selected_row is None:
+            return None
+        values = self.item_model.row_values(selected_row)
+        if values is None:
+            self.populate_item_list()
+            return None
+        return self.item_model.item_id(selected_row), values
 
     def check_quantities(self):
-        conn = sqlite3.connect('inventory.db')
-        c = conn.cursor()
-
-        # Get the sales data for each item
-        c.execute("SELECT item_name, quantity_sold, time_sold FROM sales")
-        sales_data = c.fetchall()
-
-        c.execute("SELECT name, quantity FROM items")
-        current_data = c.fetchall()
-        # Convert the sales data to a DataFrame and calculate the daily sales
-        sales_df = pd.DataFrame(sales_data, columns=['item_name', 'quantity_sold', 'time_sold'])
-        sales_df['date'] = pd.to_datetime(sales_df['time_sold'], format='%Y-%m-%d %H:%M:%S').dt.date
-        daily_sales = sales_df.groupby(['item_name', 'date'])['quantity_sold'].sum().reset_index()
-
-        # Calculate the moving average of daily sales
-        window_size = 1 # Change this to adjust the window size for the moving average
-        daily_sales['moving_avg'] = daily_sales.groupby('item_name')['quantity_sold'].rolling(window_size).mean().reset_index(0, drop=True)
-
-        daily_sales.dropna(subset=['moving_avg'], inplace=True)
-
-        # Drop any rows with NaN values
-        daily_sales.dropna(inplace=True)
-
-        # Calculate the trend in sales over time for each item
-        items = daily_sales['item_name'].unique()
-        for item in items:
-            item_sales = daily_sales[daily_sales['item_name'] == item]
-            if item_sales.empty:
-                print(f"No sales data for {item}")
-                continue
-
-            lin_reg = LinearRegression()
-            item_sales['day_index'] = (item_sales['date'] - item_sales['date'].min()).dt.days
-            lin_reg.fit(item_sales[['day_index']], item_sales['moving_avg'])
-            item_sales['trend'] = lin_reg.predict(item_sales[['day_index']])
-
-            # Calculate the residual of each data point from the trend line
-            item_sales['residual'] = item_sales['moving_avg'] - item_sales['trend']
-
-            # Calculate the standard deviation of the residuals
-            std_dev = item_sales['residual'].std()
-            
-            # Calculate the rolling mean and standard deviation of the residuals for each item
-            rolling_mean = item_sales.groupby('item_name')['residual'].rolling(window_size).mean().reset_index(0, drop=True)
-            rolling_std = item_sales.groupby('item_name')['residual'].rolling(window_size).std().reset_index(0, drop=True)
-
-            # Get the current mean and standard deviation of the residuals for the item
-            current_mean = rolling_mean.iloc[-1]
-            current_std = rolling_std.iloc[-1]
-            new_threshold = current_mean + (current_std * 2) # Change this to adjust the number of standard deviations
-
-            # Check if the standard deviation is higher than the threshold and notify if needed
-            if std_dev > new_threshold: 
-                message = f"{item} is experiencing high demand"
-                self.tray_icon.showMessage("High Demand Item", message, QSystemTrayIcon.Warning, 5000)
-
-        # Check if the quantity of the item in inventory is low and notify if needed
-        for item in current_data:
-            c.execute("SELECT quantity FROM items WHERE name = ?", (item[0],))
-            quantity_data = c.fetchone()
-            if quantity_data is not None:
-                quantity = quantity_data[0]
-                if quantity < self.min_qty_threshold:  # Change this to adjust the threshold for low inventory
-                    message = f"{item[0]} is running low in inventory"
-                    self.tray_icon.showMessage("Low Inventory Item", message, QSystemTrayIcon.Warning, 5000)
-            else:
-                print(f"No inventory data for {item[0]}")
-
-            # Close the database connection
-        conn.close()
-
-                
+        # The check runs on the worker thread; ticks are skipped while the
+        # previous check is still running
+        self.checker.request_check(self.min_qty_threshold)
+
+    def notify_high_demand(self, items):
+        # One tray message per check, however many items are flagged
+        message = alert_message(items, "experiencing high demand")
+        self.tray_icon.showMessage("High Demand Items", message, QSystemTrayIcon.Warning, 5000)
+
+    def notify_low_stock(self, items):
+        message = alert_message(items, "running low in inventory")
+        self.tray_icon.showMessage("Low Inventory Items", message, QSystemTrayIcon.Warning, 5000)
+
+    def notify_check_failed(self, message):
+        # Failures are counted on the Diagnostics tab; only report one when
+        # it differs from the last, so a lasting fault is not shown every tick
+        if message == self.last_check_error:
+            return
+        self.last_check_error = message
+        self.tray_icon.showMessage("Inventory Check Failed", message, QSystemTrayIcon.Critical, 5000)
+
+    def closeEvent(self, event):
+        # Stop the background checker before the window goes away
+        self.check_quantities_timer.stop()
+        self.event_loop_monitor.stop()
+        self.checker.stop()
+        self.orders_tab.wait()
+        if self.chart_window is not None:
+            self.chart_window.close()
+        self.repository.close()
+        super().closeEvent(event)
+
     def add_item(self):
         # Create a new window for adding an item
         add_item_window = QWidget()
@@ -315,6 +369,11 @@ class InventoryManagementSystem(QWidget):
         price_input.setFont(self.font)
         price_validator = QDoubleValidator()
         price_input.setValidator(price_validator)
+        min_qty_label = QLabel("Low stock below (blank for the global threshold):")
+        min_qty_label.setFont(self.font)
+        min_qty_input = QLineEdit()
+        min_qty_input.setFont(self.font)
+        min_qty_input.setValidator(QIntValidator(0, 2147483647))
         save_button = QPushButton("Save")
         save_button.setFont(self.font)
         cancel_button = QPushButton("Cancel")
@@ -331,6 +390,8 @@ class InventoryManagementSystem(QWidget):
         layout.addWidget(qty_input)
         layout.addWidget(price_label)
         layout.addWidget(price_input)
+        layout.addWidget(min_qty_label)
+        layout.addWidget(min_qty_input)
         layout.addWidget(save_button)
         layout.addWidget(cancel_button)
         add_item_window.setLayout(layout)
@@ -345,24 +406,13 @@ class InventoryManagementSystem(QWidget):
             desc = desc_input.text()
             qty = int(qty_input.text())
             price = float(price_input.text())
+            min_qty = int(min_qty_input.text()) if min_qty_input.text() else None
 
             # Add the new item to the database
-            conn = sqlite3.connect('inventory.db')
-            c = conn.cursor()
-            current_time = datetime.now()
-            c.execute("INSERT INTO items VALUES (?, ?, ?, ?, ?)", (name, desc, qty, price, current_time))
-            conn.commit()
-            conn.close()
+            item_id, _ = self.repository.add_item(name, desc, qty, price, min_qty)
 
             # Add the new item to the item list
-            row = self.item_list.rowCount()
-            self.item_list.setRowCount(row + 1)
-            self.item_list.setItem(row, 0, QTableWidgetItem(name))
-            self.item_list.setItem(row, 1, QTableWidgetItem(desc))
-            self.item_list.setItem(row, 2, QTableWidgetItem(str(qty)))
-            self.item_list.setItem(row, 3, QTableWidgetItem(str(price)))
-            value = datetime.strptime(str(current_time), '%Y-%m-%d %H:%M:%S.%f').strftime('%Y-%m-%d %H:%M:%S')
-            self.item_list.setItem(row, 4, QTableWidgetItem(str(value)))
+            self.item_model.add_row(item_id)
 
             # Close the add item window
             add_item_window.close()
@@ -375,14 +425,10 @@ class InventoryManagementSystem(QWidget):
 
     def edit_item(self):
         # Get the selected item from the item list
-        selected_items = self.item_list.selectedItems()
-        if len(selected_items) == 0:
+        selected = self.selected_item()
+        if selected is None:
             return
-        selected_row = selected_items[0].row()
-        name = self.item_list.item(selected_row, 0).text()
-        desc = self.item_list.item(selected_row, 1).text()
-        qty = int(self.item_list.item(selected_row, 2).text())
-        price = float(self.item_list.item(selected_row, 3).text())
+        item_id, (name, desc, qty, price) = selected
 
         # Create a new window for editing the item
         edit_item_window = QWidget()
@@ -411,6 +457,27 @@ class InventoryManagementSystem(QWidget):
         price_input.setFont(self.font)
         price_validator = QDoubleValidator()
         price_input.setValidator(price_validator)
+        supplier_label = QLabel("Supplier:")
+        supplier_label.setFont(self.font)
+        supplier_input = QComboBox()
+        supplier_input.setFont(self.font)
+        supplier_input.addItem("None", None)
+        for supplier_id, supplier_name in self.repository.supplier_names():
+            supplier_input.addItem(supplier_name, supplier_id)
+        supplier_id = self.repository.item_supplier(item_id)
+        supplier_input.setCurrentIndex(max(supplier_input.findData(supplier_id), 0))
+        min_qty = self.repository.item_min_qty(item_id)
+        min_qty_label = QLabel("Low stock below (blank for the global threshold):")
+        min_qty_label.setFont(self.font)
+        min_qty_input = QLineEdit("" if min_qty is None else str(min_qty))
+        min_qty_input.setFont(self.font)
+        min_qty_input.setValidator(QIntValidator(0, 2147483647))
+        reason_label = QLabel("Reason for a quantity change:")
+        reason_label.setFont(self.font)
+        reason_input = QComboBox()
+        reason_input.setFont(self.font)
+        for reason in ("sale", "waste", "receipt", "adjustment"):
+            reason_input.addItem(reason.capitalize(), reason)
         save_button = QPushButton("Save")
         save_button.setFont(self.font)
         cancel_button = QPushButton("Cancel")
@@ -427,6 +494,12 @@ class InventoryManagementSystem(QWidget):
         layout.addWidget(qty_input)
         layout.addWidget(price_label)
         layout.addWidget(price_input)
+        layout.addWidget(supplier_label)
+        layout.addWidget(supplier_input)
+        layout.addWidget(min_qty_label)
+        layout.addWidget(min_qty_input)
+        layout.addWidget(reason_label)
+        layout.addWidget(reason_input)
         layout.addWidget(save_button)
         layout.addWidget(cancel_button)
         edit_item_window.setLayout(layout)
@@ -441,33 +514,19 @@ class InventoryManagementSystem(QWidget):
             new_desc = desc_input.text()
             new_qty = int(qty_input.text())
             new_price = float(price_input.text())
-            current_time = datetime.now()
-
-            # Update the selected item in the database
-            conn = sqlite3.connect('inventory.db')
-            c = conn.cursor()
-            c.execute("UPDATE items SET name=?, description=?, quantity=?, price=?, time=? WHERE name=? AND description=? AND quantity=? AND price=?",
-                    (new_name, new_desc, new_qty, new_price, current_time, name, desc, qty, price))
-            conn.commit()
-
-            # Calculate the quantity difference between the original quantity and the new quantity
-            qty_diff = qty - new_qty
 
-            # If the quantity difference is positive, insert a new row into the sales table
-            if qty_diff > 0:
-                c.execute("INSERT INTO sales (item_name, quantity_sold, time_sold) VALUES (?, ?, ?)",
-                        (new_name, qty_diff, current_time))
-                conn.commit()
-
-            conn.close()
+            # Update the selected item in the database; the quantity change
+            # is journalled with the reason, and a lower quantity sold is
+            # recorded as a sale
+            self.repository.update_item(item_id, new_name, new_desc, new_qty, new_price, reason_input.currentData())
+            if supplier_input.currentData() != supplier_id:
+                self.repository.set_item_supplier(item_id, supplier_input.currentData())
+            new_min_qty = int(min_qty_input.text()) if min_qty_input.text() else None
+            if new_min_qty != min_qty:
+                self.repository.set_item_min_qty(item_id, new_min_qty)
 
             # Update the selected item in the item list
-            self.item_list.setItem(selected_row, 0, QTableWidgetItem(new_name))
-            self.item_list.setItem(selected_row, 1, QTableWidgetItem(new_desc))
-            self.item_list.setItem(selected_row, 2, QTableWidgetItem(str(new_qty)))
-            self.item_list.setItem(selected_row, 3, QTableWidgetItem(str(new_price)))
-            value = datetime.strptime(str(current_time), '%Y-%m-%d %H:%M:%S.%f').strftime('%Y-%m-%d %H:%M:%S')
-            self.item_list.setItem(selected_row, 4, QTableWidgetItem(str(value)))
+            self.item_model.update_row(item_id)
 
             # Close the edit item window
             edit_item_window.close()
@@ -481,56 +540,89 @@ class InventoryManagementSystem(QWidget):
 
     def delete_item(self):
         # Get the selected item from the item list
-        selected_items = self.item_list.selectedItems()
-        if len(selected_items) == 0:
+        selected_row = self.selected_row()
+        if selected_row is None:
             return
-        selected_row = selected_items[0].row()
-        name = self.item_list.item(selected_row, 0).text()
-        desc = self.item_list.item(selected_row, 1).text()
-        qty = int(self.item_list.item(selected_row, 2).text())
-        price = float(self.item_list.item(selected_row, 3).text())
+        item_id = self.item_model.item_id(selected_row)
 
         # Show a confirmation message box
         result = QMessageBox.question(self, "Delete Item", "Are you sure you want to delete this item?", QMessageBox.Yes | QMessageBox.No)
         if result == QMessageBox.Yes:
             # Delete the selected item from the database
-            conn = sqlite3.connect('inventory.db')
-            c = conn.cursor()
-            c.execute("DELETE FROM items WHERE name=? AND description=? AND quantity=? AND price=?", (name, desc, qty, price))
-            conn.commit()
-            conn.close()
+            self.repository.delete_item(item_id)
 
             # Delete the selected item from the item list
-            self.item_list.removeRow(selected_row)
+            self.item_model.remove_row(item_id)
     
-    def search_items(self, search_text):
-        # Filter the item list based on the search text
-        for row in range(self.item_list.rowCount()):
-            name = self.item_list.item(row, 0).text()
-            desc = self.item_list.item(row, 1).text()
-            if search_text.lower() in name.lower() or search_text.lower() in desc.lower():
-                self.item_list.setRowHidden(row, False)
-            else:
-                self.item_list.setRowHidden(row, True)
+    def record_sale(self):
+        # Sell some of the selected item: the quantity comes off the stock and
+        # the sale is logged in one transaction
+        selected = self.selected_item()
+        if selected is None:
+            return
+        item_id, (name, desc, qty, price) = selected
+
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Record Sale")
+        label = QLabel(f"Quantity of {name} sold:")
+        input = QSpinBox()
+        input.setRange(1, 999999)
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.accepted.connect(dialog.accept)
+        button_box.rejected.connect(dialog.reject)
+
+        layout = QVBoxLayout()
+        layout.addWidget(label)
+        layout.addWidget(input)
+        layout.addWidget(button_box)
+        dialog.setLayout(layout)
+
+        if dialog.exec_() == QDialog.Accepted:
+            try:
+                self.repository.record_sale(item_id, input.value())
+            except KeyError:
+                QMessageBox.warning(self, "Record Sale", f"{name} no longer exists")
+                self.item_model.remove_row(item_id)
+                return
+            self.item_model.update_row(item_id)
+
+    def show_item_history(self):
+        # The selected item's stock movements, newest first
+        selected = self.selected_item()
+        if selected is None:
+            return
+        item_id, (name, _, _, _) = selected
+        rows = [(format_micros(moved), kind.capitalize(), f"{delta:+d}", level)
+                for moved, kind, delta, level in self.repository.item_movements(item_id)]
+        self.show_report_table(f"History of {name}", ["Time", "Movement", "Change", "Stock"], rows, width=600)
 
+    def search_items(self):
+        # Filter the item list on the full-text index; every word typed must
+        # match the start of a word in the name or description
+        with METRICS.span('ui.search_items'):
+            self.item_model.set_filter(self.repository.search_item_ids(self.search_bar.text()))
 
     def export_items(self):
-        # Get the file path for the CSV file
-        file_path, _ = QFileDialog.getSaveFileName(self, "Export to CSV", "", "CSV Files (*.csv)")
+        # Items are exported with the columns the importer reads back
+        self.export_table("items", "Export Items", ['name', 'description', 'quantity', 'price', 'time', 'min_qty'])
+
+    def export_sales(self):
+        self.export_table("sales", "Export Sales")
+
+    def export_table(self, table, title, columns=None):
+        # Get the file path; the chosen filter decides the format
+        filters = {"CSV Files (*.csv)": ".csv", "Compressed CSV Files (*.csv.gz)": ".csv.gz", "Parquet Files (*.parquet)": ".parquet"}
+        file_path, selected = QFileDialog.getSaveFileName(self, title, "", ";;".join(filters))
         if not file_path:
             return
-        
-        # Export the inventory data to the CSV file
-        with open(file_path, mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(['Name', 'Description', 'Quantity', 'Price', 'Time'])
-            for row in range(self.item_list.rowCount()):
-                name = self.item_list.item(row, 0).text()
-                desc = self.item_list.item(row, 1).text()
-                qty = self.item_list.item(row, 2).text()
-                price = self.item_list.item(row, 3).text()
-                time = self.item_list.item(row, 4).text()
-                writer.writerow([name, desc, qty, price, time])
+        if export_format(file_path) != export_format(filters.get(selected, ".csv")):
+            file_path += filters[selected]
+
+        # Stream the table from the database to the file on a background thread
+        self.export_thread = ExportThread(self.repository, table, file_path, columns, self)
+        self.export_thread.exported.connect(lambda rows: QMessageBox.information(self, title, f"Exported {rows} rows to {file_path}"))
+        self.export_thread.failed.connect(lambda message: QMessageBox.warning(self, title, f"Export failed: {message}"))
+        self.export_thread.start()
 
     def import_items(self):
         # Get the file path for the CSV file
@@ -539,42 +631,79 @@ class InventoryManagementSystem(QWidget):
         if not file_path:
             return
         
-        # Import the inventory data from the CSV file
-        with open(file_path, mode='r') as file:
-            reader = csv.reader(file)
-            next(reader) # Skip the header row
-            for row in reader:
-                name = row[0]
-                desc = row[1]
-                qty = int(row[2])
-                price = float(row[3])
-                time = row[4]
-                self.add_item_to_table(name, desc, qty, price, time)
+        # Import the inventory data from the CSV file on a background thread
+        self.import_progress = QProgressDialog("Importing items...", None, 0, 100, self)
+        self.import_progress.setWindowTitle("Import")
+        self.import_progress.setWindowModality(Qt.WindowModal)
+        self.import_progress.show()
+
+        self.import_thread = ImportThread(self.repository, file_path, self)
+        self.import_thread.progress.connect(self.import_progressed)
+        self.import_thread.imported.connect(self.import_finished)
+        self.import_thread.failed.connect(self.import_failed)
+        self.import_thread.start()
+
+    def import_progressed(self, rows, percent):
+        self.import_progress.setLabelText(f"Importing items... {rows} rows read")
+        self.import_progress.setValue(percent)
+
+    def import_finished(self, result):
+        self.import_progress.close()
+        self.populate_item_list()
+        QMessageBox.information(self, "Import", result.summary())
+
+    def import_failed(self, message):
+        self.import_progress.close()
+        QMessageBox.warning(self, "Import", f"Import failed: {message}")
 
     def about(self):
         # Show a message box with information about the program
         QMessageBox.about(self, "About Inventory Manager", "This program allows you to manage your inventory.\n")
 
 
-    def generate_bar_chart(self):
-        conn = sqlite3.connect("inventory.db")
-        c = conn.cursor()
+    def show_cache_stats(self):
+        stats = self.repository.cache.stats()
+        message = (f"Cached results: {stats['entries']}\n"
+                   f"Hits: {stats['hits']}\n"
+                   f"Misses: {stats['misses']}\n"
+                   f"Evictions: {stats['evictions']}\n"
+                   f"Hit rate: {stats['hit_rate']:.0%}")
+        QMessageBox.information(self, "Cache Statistics", message)
 
-        # Retrieve data from the database
-        c.execute("SELECT name, quantity FROM items")
-        data = c.fetchall()
+    def diagnostics_sections(self):
+        # Shown on the Diagnostics tab and saved with the metrics
+        return {'cache': self.repository.cache.stats(), 'items': self.repository.item_store.stats(),
+                'checker': self.checker.metrics()}
 
-        # Create a bar chart showing the quantity of each item in the inventory
-        items = [d[0] for d in data]
-        quantities = [d[1] for d in data]
-        y_pos = np.arange(len(items))
-        plt.bar(y_pos, quantities, align='center', alpha=0.5)
-        plt.xticks(y_pos, items)
-        plt.ylabel('Quantity')
-        plt.title('Inventory Report')
+    def toggle_cpu_profile(self, enabled):
+        if enabled:
+            self.profiler.start_profile()
+            return
+        path = time.strftime("profile-%Y%m%d-%H%M%S.prof")
+        self.show_profile("CPU Profile", f"Profile saved to {path}", self.profiler.stop_profile(path))
 
-        # Show the chart
-        plt.show()
+    def toggle_memory_trace(self, enabled):
+        if enabled:
+            self.profiler.start_memory()
+            return
+        path = time.strftime("memory-%Y%m%d-%H%M%S.txt")
+        self.show_profile("Memory Allocations", f"Allocation report saved to {path}", self.profiler.stop_memory(path))
+
+    def show_profile(self, title, message, details):
+        box = QMessageBox(QMessageBox.Information, title, message, QMessageBox.Ok, self)
+        box.setDetailedText(details)
+        box.exec_()
+
+    def generate_bar_chart(self):
+        # The chart window and its figure are created on first use and then
+        # reused; matplotlib is only loaded at that point
+        with METRICS.span('ui.chart'):
+            if self.chart_window is None:
+                from chart import ChartWindow
+                self.chart_window = ChartWindow(self.repository)
+            self.chart_window.refresh()
+        self.chart_window.show()
+        self.chart_window.raise_()
 
 
     def set_min_qty_threshold(self):
@@ -618,6 +747,41 @@ class InventoryManagementSystem(QWidget):
         # Load the window size setting
         self.window_size = settings.value("window_size", 7, type=int)
 
+        # Load this site's database and the other sites' databases
+        self.database_path = settings.value("database_path", "inventory.db")
+        self.sites = []
+        for index in range(settings.beginReadArray("sites")):
+            settings.setArrayIndex(index)
+            self.sites.append((settings.value("name"), settings.value("path")))
+        settings.endArray()
+
+    def set_locations(self):
+        dialog = SitesDialog(self.database_path, self.sites, self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        self.sites = dialog.sites()
+        settings = QSettings("MyCompany", "InventoryManagementSystem")
+        settings.beginWriteArray("sites", len(self.sites))
+        for index, (name, path) in enumerate(self.sites):
+            settings.setArrayIndex(index)
+            settings.setValue("name", name)
+            settings.setValue("path", path)
+        settings.endArray()
+        # The open database is kept until the next start
+        if dialog.database_path() != self.database_path:
+            self.database_path = dialog.database_path()
+            settings.setValue("database_path", self.database_path)
+            QMessageBox.information(self, "Locations", f"{self.database_path} will be used after a restart")
+
+    def site_group(self):
+        # This site and every other configured site
+        return SiteGroup([("This Site", self.repository.path)] + self.sites)
+
+    def report_site_errors(self, title, errors):
+        if errors:
+            message = "\n".join(f"{name}: {error}" for name, error in errors.items())
+            QMessageBox.warning(self, title, f"Some sites could not be read:\n{message}")
+
 
     def generate_sales_report(self):
         # Get the start and end dates from the user
@@ -626,44 +790,104 @@ class InventoryManagementSystem(QWidget):
             start_date, end_date = sales_report_dialog.get_date_range()
 
             # Fetch the sales data from the database
-            conn = sqlite3.connect("inventory.db")
-            c = conn.cursor()
-            c.execute("SELECT item_name, SUM(quantity_sold) FROM sales WHERE time_sold BETWEEN ? AND ? GROUP BY item_name", (start_date, end_date))
-            sales_data = c.fetchall()
-            # Close the database connection
-            conn.close()
-
-            # Create a new dialog for displaying the stock used
-            dialog = QDialog(self)
-            dialog.setWindowTitle("Sales Report")
-            dialog.setGeometry(100, 100, 400, 400)
-
-            # Create a table widget for the stock used
-            table = QTableWidget()
-            table.setColumnCount(2)
-            table.setHorizontalHeaderLabels(["Item Name", "Total Quantity Used"])
-            
-            # Set the number of rows for the table
-            table.setRowCount(len(sales_data))
-
-            # Add the sales data to the table widget
-            for row, data in enumerate(sales_data):
-                name, quantity = data
-                table.setItem(row, 0, QTableWidgetItem(name))
-                table.setItem(row, 1, QTableWidgetItem(str(quantity)))
-
-            # Add the table widget to the dialog
-            layout = QVBoxLayout()
-            layout.addWidget(table)
-            dialog.setLayout(layout)
-
-            # Show the dialog
-            dialog.exec_()
+            with METRICS.span('ui.sales_report'):
+                sales_data = self.repository.sales_report(start_date, end_date)
+            self.show_report_table("Sales Report", ["Item Name", "Total Quantity Used"], sales_data)
         else:
             return
 
+    def generate_consolidated_sales_report(self):
+        # Stock used per item at every site, read in parallel, with a column
+        # per site
+        sales_report_dialog = StockUsedDialog(self)
+        if sales_report_dialog.exec_() != QDialog.Accepted:
+            return
+        start_date, end_date = sales_report_dialog.get_date_range()
+        with METRICS.span('ui.consolidated_sales_report'):
+            names, rows, errors = self.site_group().sales_report(start_date, end_date)
+        self.report_site_errors("Consolidated Stock Used Report", errors)
+        self.show_report_table("Consolidated Stock Used Report", ["Item Name", "Total"] + names, rows,
+                               width=300 + 100 * len(names))
+
+    def generate_consolidated_low_stock_report(self):
+        with METRICS.span('ui.consolidated_low_stock_report'):
+            names, rows, errors = self.site_group().low_stock(self.min_qty_threshold)
+        self.report_site_errors("Consolidated Low Stock Report", errors)
+        self.show_report_table("Consolidated Low Stock Report", ["Site", "Item Name", "Quantity", "Minimum"], rows,
+                               width=600)
+
+    def generate_stock_on_date_report(self):
+        # Every item's stock at the end of a chosen day, from the nearest
+        # snapshot plus the movements since
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Stock On Date")
+        calendar = QCalendarWidget()
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.accepted.connect(dialog.accept)
+        button_box.rejected.connect(dialog.reject)
+        layout = QVBoxLayout()
+        layout.addWidget(calendar)
+        layout.addWidget(button_box)
+        dialog.setLayout(layout)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+
+        day = calendar.selectedDate().toPyDate()
+        with METRICS.span('ui.stock_on_date_report'):
+            levels = self.repository.stock_at(to_micros(day) + MICROS_PER_DAY)
+        self.show_report_table(f"Stock at the end of {day.isoformat()}", ["Item Name", "Quantity"],
+                               [(name, quantity) for _, name, quantity in levels])
+
+    def generate_forecast_report(self):
+        # Forecast demand for every item from the daily sales of the last
+        # eight windows of window_size days (eight weeks by default), soonest
+        # stockout first
+        with METRICS.span('ui.forecast_report'):
+            forecast = self.repository.demand_forecast(history_days=self.window_size * 8)
+            rows = [(name, on_hand, demand, "-" if days is None else days, reorder)
+                    for name, on_hand, demand, days, reorder in forecast.rows()]
+        self.show_report_table("Forecast Report", ["Item Name", "On Hand", "Daily Demand", "Days Until Stockout",
+                                                   "Reorder Quantity"], rows, width=700)
+
+    def show_report_table(self, title, headers, rows, width=400):
+        # Create a new dialog for displaying the report
+        dialog = QDialog(self)
+        dialog.setWindowTitle(title)
+        dialog.setGeometry(100, 100, width, 400)
+
+        # Create a table widget for the report
+        table = QTableWidget()
+        table.setColumnCount(len(headers))
+        table.setHorizontalHeaderLabels(headers)
+
+        # Set the number of rows for the table
+        table.setRowCount(len(rows))
+
+        # Add the report rows to the table widget
+        for row, data in enumerate(rows):
+            for column, value in enumerate(data):
+                table.setItem(row, column, QTableWidgetItem(str(value)))
+
+        # Add the table widget to the dialog
+        layout = QVBoxLayout()
+        layout.addWidget(table)
+        dialog.setLayout(layout)
+
+        # Show the dialog
+        dialog.exec_()
+
+def report_startup_time():
+    # Shown on the Diagnostics tab as ui.startup; a startup over the budget
+    # is also counted as ui.startup.over_budget
+    elapsed = time.perf_counter() - started
+    METRICS.record('ui.startup', elapsed)
+    if elapsed > STARTUP_BUDGET:
+        METRICS.record('ui.startup.over_budget', elapsed)
+
+
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     window = InventoryManagementSystem()
     window.show()
+    QTimer.singleShot(0, report_startup_time)
     sys.exit(app.exec_())
@@ -0,0 +1,303 @@
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt, pyqtSignal
+from PyQt5.QtWidgets import (QDialog, QDialogButtonBox, QFormLayout, QHBoxLayout, QLineEdit, QMessageBox, QPushButton,
+                             QSpinBox, QTableView, QTableWidget, QTableWidgetItem, QVBoxLayout, QWidget)
+
+from inventory_core.timeutil import format_micros
+from worker import ReorderThread
+
+SUPPLIER_HEADERS = ["Supplier", "Contact", "Lead Time (days)", "Items"]
+ORDER_HEADERS = ["Order", "Supplier", "Status", "Created", "Lines", "Total"]
+LINE_HEADERS = ["Item Name", "Quantity", "Unit Price"]
+
+
+def text(value):
+    return "" if value is None else str(value)
+
+
+def money(value):
+    return "" if value is None else f"{value:.2f}"
+
+
+class PagedTableModel(QAbstractTableModel):
+    # Read-only table that loads its rows a page at a time as the view
+    # scrolls. fetch_page(last_key, limit) returns the rows after the row
+    # whose first column is last_key (None for the first page). Only the
+    # last len(headers) columns are shown, so rows can lead with an id;
+    # formatters turn each shown column's values into display text.
+
+    def __init__(self, headers, fetch_page, formatters, page_size=256, parent=None):
+        super().__init__(parent)
+        self.headers = headers
+        self.fetch_page = fetch_page
+        self.formatters = formatters
+        self.page_size = page_size
+        self.rows = []
+        self.done = False
+
+    def reload(self):
+        self.beginResetModel()
+        self.rows = []
+        self.done = False
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.headers)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return not self.done
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.done:
+            return
+        page = self.fetch_page(self.rows[-1][0] if self.rows else None, self.page_size)
+        if len(page) < self.page_size:
+            self.done = True
+        if not page:
+            return
+        start = len(self.rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(page) - 1)
+        self.rows.extend(page)
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        if role == Qt.UserRole:
+            return row[0]
+        if role != Qt.DisplayRole:
+            return None
+        column = len(row) - len(self.headers) + index.column()
+        return self.formatters[index.column()](row[column])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+    def row(self, row):
+        return self.rows[row]
+
+
+def table_view(model):
+    view = QTableView()
+    view.setModel(model)
+    view.setEditTriggers(QTableView.NoEditTriggers)
+    view.setSelectionBehavior(QTableView.SelectRows)
+    view.setSelectionMode(QTableView.SingleSelection)
+    return view
+
+
+def selected_row(view):
+    rows = view.selectionModel().selectedRows()
+    if len(rows) == 0:
+        return None
+    return rows[0].row()
+
+
+class SuppliersTab(QWidget):
+    # Suppliers, loaded when the tab is first shown
+
+    def __init__(self, repository, parent=None):
+        super().__init__(parent)
+        self.repository = repository
+        self.loaded = False
+
+        self.model = PagedTableModel(SUPPLIER_HEADERS, lambda after, limit: repository.suppliers_page(after or 0, limit),
+                                     [text, text, text, text], parent=self)
+        self.view = table_view(self.model)
+
+        add_button = QPushButton("Add Supplier")
+        add_button.clicked.connect(self.add_supplier)
+        edit_button = QPushButton("Edit Supplier")
+        edit_button.clicked.connect(self.edit_supplier)
+        delete_button = QPushButton("Delete Supplier")
+        delete_button.clicked.connect(self.delete_supplier)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(add_button)
+        buttons.addWidget(edit_button)
+        buttons.addWidget(delete_button)
+        buttons.addStretch()
+        layout = QVBoxLayout()
+        layout.addLayout(buttons)
+        layout.addWidget(self.view)
+        self.setLayout(layout)
+
+    def showEvent(self, event):
+        if not self.loaded:
+            self.loaded = True
+            self.model.reload()
+        super().showEvent(event)
+
+    def supplier_dialog(self, title, name="", contact="", lead_time=7):
+        # Returns (name, contact, lead time) or None when cancelled
+        dialog = QDialog(self)
+        dialog.setWindowTitle(title)
+        name_input = QLineEdit(name)
+        contact_input = QLineEdit(contact or "")
+        lead_time_input = QSpinBox()
+        lead_time_input.setRange(0, 365)
+        lead_time_input.setValue(lead_time)
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.accepted.connect(dialog.accept)
+        button_box.rejected.connect(dialog.reject)
+
+        layout = QFormLayout()
+        layout.addRow("Name:", name_input)
+        layout.addRow("Contact:", contact_input)
+        layout.addRow("Lead time (days):", lead_time_input)
+        layout.addRow(button_box)
+        dialog.setLayout(layout)
+
+        if dialog.exec_() != QDialog.Accepted or not name_input.text().strip():
+            return None
+        return name_input.text().strip(), contact_input.text().strip() or None, lead_time_input.value()
+
+    def selected_supplier(self):
+        row = selected_row(self.view)
+        return None if row is None else self.model.row(row)
+
+    def add_supplier(self):
+        values = self.supplier_dialog("Add Supplier")
+        if values is not None:
+            self.repository.add_supplier(*values)
+            self.model.reload()
+
+    def edit_supplier(self):
+        supplier = self.selected_supplier()
+        if supplier is None:
+            return
+        supplier_id, name, contact, lead_time, _ = supplier
+        values = self.supplier_dialog("Edit Supplier", name, contact, lead_time)
+        if values is not None:
+            self.repository.update_supplier(supplier_id, *values)
+            self.model.reload()
+
+    def delete_supplier(self):
+        supplier = self.selected_supplier()
+        if supplier is None:
+            return
+        result = QMessageBox.question(self, "Delete Supplier", f"Delete {supplier[1]}? Its items and orders are kept.",
+                                      QMessageBox.Yes | QMessageBox.No)
+        if result == QMessageBox.Yes:
+            self.repository.delete_supplier(supplier[0])
+            self.model.reload()
+
+
+class OrdersTab(QWidget):
+    # Purchase orders, newest first, with the lines of the selected order
+    # below them. Loaded when the tab is first shown; reorders are generated
+    # on a worker thread. stock_received is emitted after an order is
+    # received into stock.
+    stock_received = pyqtSignal()
+
+    def __init__(self, repository, min_qty_threshold, parent=None):
+        super().__init__(parent)
+        self.repository = repository
+        self.min_qty_threshold = min_qty_threshold
+        self.loaded = False
+        self.reorder_thread = None
+
+        self.model = PagedTableModel(ORDER_HEADERS, self.repository.orders_page,
+                                     [text, text, str.capitalize, format_micros, text, money], parent=self)
+        self.view = table_view(self.model)
+        self.view.selectionModel().selectionChanged.connect(self.show_lines)
+        self.lines_table = QTableWidget()
+        self.lines_table.setColumnCount(len(LINE_HEADERS))
+        self.lines_table.setHorizontalHeaderLabels(LINE_HEADERS)
+        self.lines_table.setEditTriggers(QTableWidget.NoEditTriggers)
+
+        self.generate_button = QPushButton("Generate Reorders")
+        self.generate_button.clicked.connect(self.generate_reorders)
+        sent_button = QPushButton("Mark Sent")
+        sent_button.clicked.connect(lambda: self.set_status('sent'))
+        receive_button = QPushButton("Receive")
+        receive_button.clicked.connect(self.receive_order)
+        cancel_button = QPushButton("Cancel Order")
+        cancel_button.clicked.connect(lambda: self.set_status('cancelled'))
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.generate_button)
+        buttons.addWidget(sent_button)
+        buttons.addWidget(receive_button)
+        buttons.addWidget(cancel_button)
+        buttons.addStretch()
+        layout = QVBoxLayout()
+        layout.addLayout(buttons)
+        layout.addWidget(self.view, 2)
+        layout.addWidget(self.lines_table, 1)
+        self.setLayout(layout)
+
+    def showEvent(self, event):
+        if not self.loaded:
+            self.loaded = True
+            self.reload()
+        super().showEvent(event)
+
+    def reload(self):
+        self.model.reload()
+        self.lines_table.setRowCount(0)
+
+    def selected_order(self):
+        row = selected_row(self.view)
+        return None if row is None else self.model.row(row)[0]
+
+    def show_lines(self):
+        order_id = self.selected_order()
+        lines = [] if order_id is None else self.repository.order_lines(order_id)
+        self.lines_table.setRowCount(len(lines))
+        for row, (_, name, quantity, unit_price) in enumerate(lines):
+            for column, value in enumerate((text(name), text(quantity), money(unit_price))):
+                self.lines_table.setItem(row, column, QTableWidgetItem(value))
+
+    def generate_reorders(self):
+        self.generate_button.setEnabled(False)
+        self.reorder_thread = ReorderThread(self.repository, self.min_qty_threshold(), self)
+        self.reorder_thread.generated.connect(self.reorders_generated)
+        self.reorder_thread.failed.connect(self.reorders_failed)
+        self.reorder_thread.finished.connect(lambda: self.generate_button.setEnabled(True))
+        self.reorder_thread.start()
+
+    def reorders_generated(self, orders, lines):
+        self.reload()
+        if lines:
+            message = f"Added {lines} items to {orders} draft orders"
+        else:
+            message = "Every item is above its reorder point"
+        QMessageBox.information(self, "Generate Reorders", message)
+
+    def reorders_failed(self, message):
+        QMessageBox.critical(self, "Generate Reorders", f"Generating reorders failed: {message}")
+
+    def set_status(self, status):
+        order_id = self.selected_order()
+        if order_id is None:
+            return
+        if not self.repository.set_order_status(order_id, status):
+            QMessageBox.warning(self, "Orders", f"Order {order_id} is no longer open")
+        self.reload()
+
+    def receive_order(self):
+        order_id = self.selected_order()
+        if order_id is None:
+            return
+        if self.repository.receive_order(order_id):
+            self.stock_received.emit()
+        else:
+            QMessageBox.warning(self, "Orders", f"Order {order_id} is no longer open")
+        self.reload()
+
+    def wait(self):
+        # Let a running reorder finish before the database is closed
+        if self.reorder_thread is not None:
+            self.reorder_thread.wait()
@@ -1,16 +1,11 @@
 import sqlite3
 
-conn = sqlite3.connect('inventory.db')
-c = conn.cursor()
+from inventory_core import migrate
 
-# Create the item table
-c.execute('''CREATE TABLE items
-             (name text, description text, quantity integer, price real, time text)''')
+conn = sqlite3.connect('inventory.db')
 
-# Create the useage table
-c.execute('''CREATE TABLE sales
-             (item_name text, quantity_sold integer, time_sold text)''')
+# Create the tables, or upgrade an existing database to the latest schema
+migrate(conn)
 
-# Save the changes and close the connection
-conn.commit()
-conn.close()
\ No newline at end of file
+# Close the connection
+conn.close()
@@ -0,0 +1,88 @@
+import os
+
+from PyQt5.QtWidgets import (QDialog, QDialogButtonBox, QFileDialog, QHBoxLayout, QLabel, QLineEdit, QPushButton,
+                             QTableWidget, QTableWidgetItem, QVBoxLayout)
+
+DATABASE_FILTER = "Databases (*.db *.sqlite);;All Files (*)"
+
+
+class SitesDialog(QDialog):
+    # Picks this site's database and the other sites' databases that the
+    # consolidated reports read. Names and paths can be edited in place.
+
+    def __init__(self, database_path, sites, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Locations")
+        self.setGeometry(100, 100, 600, 400)
+
+        self.database_input = QLineEdit(database_path)
+        browse_button = QPushButton("Browse...")
+        browse_button.clicked.connect(self.browse_database)
+
+        self.sites_table = QTableWidget(0, 2)
+        self.sites_table.setHorizontalHeaderLabels(["Site", "Database"])
+        self.sites_table.horizontalHeader().setStretchLastSection(True)
+        for name, path in sites:
+            self.append_site(name, path)
+
+        add_button = QPushButton("Add Site")
+        add_button.clicked.connect(self.add_site)
+        remove_button = QPushButton("Remove Site")
+        remove_button.clicked.connect(self.remove_site)
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+
+        database_row = QHBoxLayout()
+        database_row.addWidget(self.database_input)
+        database_row.addWidget(browse_button)
+        site_buttons = QHBoxLayout()
+        site_buttons.addWidget(add_button)
+        site_buttons.addWidget(remove_button)
+        site_buttons.addStretch()
+
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel("This site's database (used after a restart):"))
+        layout.addLayout(database_row)
+        layout.addWidget(QLabel("Other sites, opened read-only for consolidated reports:"))
+        layout.addWidget(self.sites_table)
+        layout.addLayout(site_buttons)
+        layout.addWidget(button_box)
+        self.setLayout(layout)
+
+    def browse_database(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Database", self.database_input.text(), DATABASE_FILTER,
+                                              options=QFileDialog.DontConfirmOverwrite)
+        if path:
+            self.database_input.setText(path)
+
+    def append_site(self, name, path):
+        row = self.sites_table.rowCount()
+        self.sites_table.insertRow(row)
+        self.sites_table.setItem(row, 0, QTableWidgetItem(name))
+        self.sites_table.setItem(row, 1, QTableWidgetItem(path))
+
+    def add_site(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Site Database", "", DATABASE_FILTER)
+        if path:
+            self.append_site(os.path.splitext(os.path.basename(path))[0], path)
+
+    def remove_site(self):
+        row = self.sites_table.currentRow()
+        if row >= 0:
+            self.sites_table.removeRow(row)
+
+    def database_path(self):
+        return self.database_input.text().strip() or "inventory.db"
+
+    def sites(self):
+        # (name, path) of every site with a path; unnamed sites are named
+        # after their file
+        sites = []
+        for row in range(self.sites_table.rowCount()):
+            name, path = (self.sites_table.item(row, column) for column in (0, 1))
+            path = path.text().strip() if path is not None else ""
+            if path:
+                name = name.text().strip() if name is not None else ""
+                sites.append((name or os.path.splitext(os.path.basename(path))[0], path))
+        return sites
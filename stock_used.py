@@ -1,4 +1,8 @@
-from PyQt5.QtWidgets import QDialogButtonBox, QCalendarWidget, QDialog, QVBoxLayout,  QLabel
+from datetime import date, timedelta
+
+from PyQt5.QtWidgets import QDialogButtonBox, QCalendarWidget, QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton
+
+from inventory_core.timeutil import to_micros
 
 class StockUsedDialog(QDialog):
     def __init__(self, parent=None):
@@ -14,8 +18,18 @@ class StockUsedDialog(QDialog):
         button_box.accepted.connect(self.accept)
         button_box.rejected.connect(self.reject)
 
+        # Quick ranges ending today
+        presets = QHBoxLayout()
+        for title, days_back in (("Today", lambda today: 0),
+                                 ("This Week", lambda today: today.weekday()),
+                                 ("Last 30 Days", lambda today: 29)):
+            button = QPushButton(title)
+            button.clicked.connect(lambda checked, days_back=days_back: self.select_preset(days_back))
+            presets.addWidget(button)
+
         # Add widgets to layout
         layout = QVBoxLayout()
+        layout.addLayout(presets)
         layout.addWidget(start_date_label)
         layout.addWidget(self.start_date_picker)
         layout.addWidget(end_date_label)
@@ -23,7 +37,13 @@ class StockUsedDialog(QDialog):
         layout.addWidget(button_box)
         self.setLayout(layout)
 
+    def select_preset(self, days_back):
+        today = date.today()
+        self.start_date_picker.setSelectedDate(today - timedelta(days=days_back(today)))
+        self.end_date_picker.setSelectedDate(today)
+
     def get_date_range(self):
-        start_date = self.start_date_picker.selectedDate().toString("yyyy-MM-dd HH:MM:SS")
-        end_date = self.end_date_picker.selectedDate().toString("yyyy-MM-dd HH:MM:SS")
-        return start_date, end_date
\ No newline at end of file
+        # Half-open range [start, end) in micros covering the whole end day
+        start_date = self.start_date_picker.selectedDate().toPyDate()
+        end_date = self.end_date_picker.selectedDate().toPyDate() + timedelta(days=1)
+        return to_micros(start_date), to_micros(end_date)
@@ -0,0 +1,196 @@
+import sqlite3
+import time
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+from inventory_core import InventoryCheck, export_table, import_csv
+from inventory_core.metrics import METRICS
+
+
+class InventoryCheckWorker(QObject):
+    # Runs the periodic inventory analysis on its own thread and database
+    # connection and reports the results back through signals. items_changed
+    # is emitted when the item store was reloaded after writes from another
+    # process; failed carries the error of a check that did not finish.
+    high_demand = pyqtSignal(list)
+    low_stock = pyqtSignal(list)
+    items_changed = pyqtSignal()
+    failed = pyqtSignal(str)
+    finished = pyqtSignal(float)
+
+    def __init__(self, repository, window_size=1):
+        super().__init__()
+        self.repository = repository
+        self.conn = None
+        self.external_changes = repository.external_changes
+        self.inventory_check = InventoryCheck(window_size)
+
+    @pyqtSlot(int)
+    def run_check(self, min_qty_threshold):
+        start = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = self.repository.connect()
+
+            # Writes from another process may also have been noticed by a
+            # cached report or one of our transactions since the last check.
+            # The store is loaded again here, off the GUI thread, before the
+            # table is told to refresh.
+            with METRICS.span('check.sync_items'):
+                self.repository.sync_items()
+                if self.repository.external_changes != self.external_changes:
+                    self.external_changes = self.repository.external_changes
+                    self.repository.items()
+                    self.items_changed.emit()
+            high_demand, low_stock = self.inventory_check.run(self.conn, min_qty_threshold, self.repository.items())
+            if high_demand:
+                self.high_demand.emit(high_demand)
+            if low_stock:
+                self.low_stock.emit(low_stock)
+
+            # Stock snapshots are kept up to date from here, off the GUI thread
+            with METRICS.span('check.snapshot'):
+                self.repository.snapshot_if_due()
+        except Exception as e:
+            # Any failure ends this check only; the next tick tries again
+            METRICS.record('check.failed', time.perf_counter() - start)
+            self.failed.emit(str(e) or type(e).__name__)
+        finally:
+            duration = time.perf_counter() - start
+            METRICS.record('check.total', duration)
+            self.finished.emit(duration)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class InventoryChecker(QObject):
+    # Owns the worker thread. Lives on the GUI thread, drops ticks while a
+    # check is still running and keeps timing metrics for the checks.
+    check_requested = pyqtSignal(int)
+
+    def __init__(self, repository, window_size=1, parent=None):
+        super().__init__(parent)
+        self.worker_thread = QThread()
+        self.worker = InventoryCheckWorker(repository, window_size)
+        self.worker.moveToThread(self.worker_thread)
+        self.check_requested.connect(self.worker.run_check)
+        self.worker.finished.connect(self.check_finished)
+        self.worker.failed.connect(self.check_failed)
+        self.high_demand = self.worker.high_demand
+        self.low_stock = self.worker.low_stock
+        self.items_changed = self.worker.items_changed
+        self.failed = self.worker.failed
+
+        self.busy = False
+        self.runs = 0
+        self.skipped = 0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+        self.failures = 0
+        self.last_error = None
+
+        self.worker_thread.start()
+
+    def request_check(self, min_qty_threshold):
+        if self.busy:
+            self.skipped += 1
+            return False
+        self.busy = True
+        self.check_requested.emit(min_qty_threshold)
+        return True
+
+    def check_finished(self, duration):
+        self.busy = False
+        self.runs += 1
+        self.last_duration = duration
+        self.max_duration = max(self.max_duration, duration)
+        self.total_duration += duration
+
+    def check_failed(self, message):
+        self.failures += 1
+        self.last_error = message
+
+    def metrics(self):
+        return {
+            'runs': self.runs,
+            'skipped': self.skipped,
+            'busy': self.busy,
+            'last_duration': self.last_duration,
+            'max_duration': self.max_duration,
+            'avg_duration': self.total_duration / self.runs if self.runs else 0.0,
+            'failures': self.failures,
+            'last_error': self.last_error,
+        }
+
+    def stop(self):
+        self.worker_thread.quit()
+        self.worker_thread.wait()
+        self.worker.close()
+
+
+class ImportThread(QThread):
+    # Runs a CSV import off the GUI thread and reports progress as a percentage
+    progress = pyqtSignal(int, int)
+    imported = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, repository, path, parent=None):
+        super().__init__(parent)
+        self.repository = repository
+        self.path = path
+
+    def report_progress(self, rows, read, size):
+        self.progress.emit(rows, min(100, read * 100 // size) if size else 100)
+
+    def run(self):
+        try:
+            result = import_csv(self.repository, self.path, progress=self.report_progress)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            self.failed.emit(str(e))
+            return
+        self.imported.emit(result)
+
+
+class ExportThread(QThread):
+    # Streams a table to a file off the GUI thread
+    progress = pyqtSignal(int)
+    exported = pyqtSignal(int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, repository, table, path, columns=None, parent=None):
+        super().__init__(parent)
+        self.repository = repository
+        self.table = table
+        self.path = path
+        self.columns = columns
+
+    def run(self):
+        try:
+            rows = export_table(self.repository, self.table, self.path, columns=self.columns, progress=self.progress.emit)
+        except (OSError, ValueError, ImportError, sqlite3.Error) as e:
+            self.failed.emit(str(e))
+            return
+        self.exported.emit(rows)
+
+
+class ReorderThread(QThread):
+    # Generates draft purchase orders off the GUI thread
+    generated = pyqtSignal(int, int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, repository, min_qty_threshold, parent=None):
+        super().__init__(parent)
+        self.repository = repository
+        self.min_qty_threshold = min_qty_threshold
+
+    def run(self):
+        try:
+            orders, lines = self.repository.generate_reorders(self.min_qty_threshold)
+        except sqlite3.Error as e:
+            self.failed.emit(str(e))
+            return
+        self.generated.emit(orders, lines)